@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Measures how many tasks per second copperbench generates.
+
+    python benchmarks/generation.py [--sizes 10000 100000 1000000] [--dir /path/on/nfs]
+
+For every size a synthetic benchmark with 10 configs, 5 runs and size/50 instances is generated
+into a temporary directory (below --dir, which should be on the file system you want to measure).
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from copperbench.bench import BenchConfig, generate
+
+NUM_CONFIGS = 10
+NUM_RUNS = 5
+
+
+def setup(root: Path, num_tasks: int) -> BenchConfig:
+    num_instances = max(1, num_tasks // (NUM_CONFIGS * NUM_RUNS))
+    with open(root / 'configs.txt', 'w') as fh:
+        for i in range(NUM_CONFIGS):
+            fh.write(f'$file{{solver}} --config {i} --seed $seed --timeout $timeout\n')
+    with open(root / 'instances.txt', 'w') as fh:
+        for i in range(num_instances):
+            suffix = '.cnf.bz2' if i % 2 == 0 else '.cnf'
+            fh.write(f'instances/instance{i}{suffix}\n')
+    return BenchConfig(name=str(root / 'bench'), instances='instances.txt', configs='configs.txt', timeout=60,
+                       request_cpus=1, mem_limit=8000, runs=NUM_RUNS, initial_seed=1234, warn_large_task_num=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--dir', default=None, help='directory in which the benchmarks are generated')
+    parser.add_argument('--workers', type=int, default=None, help='generation_workers passed to copperbench')
+    parser.add_argument('--keep', action='store_true', help='do not delete the generated benchmarks')
+    args = parser.parse_args()
+
+    print(f'{"tasks":>10} {"seconds":>10} {"tasks/s":>10}')
+    for size in args.sizes:
+        root = Path(tempfile.mkdtemp(prefix='copperbench_gen_', dir=args.dir))
+        try:
+            bench_config = setup(root, size)
+            bench_config.generation_workers = args.workers
+            start = time.perf_counter()
+            num_tasks, _ = generate(bench_config, str(root))
+            elapsed = time.perf_counter() - start
+            print(f'{num_tasks:>10} {elapsed:>10.2f} {num_tasks / elapsed:>10.0f}', flush=True)
+        finally:
+            if not args.keep:
+                shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
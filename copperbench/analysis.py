@@ -0,0 +1,155 @@
+#!/usr/bin/false
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+BOOTSTRAP_BATCH = 1 << 24
+
+
+@dataclass
+class ScoreMatrix:
+    """
+    Per config (rows) and instance (columns) the mean PAR-k score, the fraction of solved runs and the number of
+    runs, NaN/0 where a config has no run on an instance.
+    """
+    configs: np.ndarray
+    instances: np.ndarray
+    scores: np.ndarray
+    solved: np.ndarray
+    runs: np.ndarray
+    timeout: float
+    k: float
+
+
+def read_timeout(metadata_file: Union[Path, str]) -> float:
+    with open(metadata_file, 'r') as file:
+        return json.loads(file.read())['timeout']
+
+
+def _column(data, name: str) -> np.ndarray:
+    return np.asarray(data[name])
+
+
+def _flag(data, name: str) -> np.ndarray:
+    # missing values (None or NaN) are false
+    return np.asarray(data[name], dtype=object) == True
+
+
+def score_matrix(data, timeout: float, k: float = 10, time: str = 'runsolver_cpu_time',
+                 solved: Optional[str] = None) -> ScoreMatrix:
+    """
+    Aggregates run records (a dict of columns as built by postprocess.ColumnBuilder, or a pandas DataFrame) into a
+    ScoreMatrix. A run is solved if its solved column is true (if given) and it finished within the timeout without
+    exceeding a runsolver limit, unsolved runs are scored with k times the timeout (PAR-k).
+    """
+    # hash based factorization is much faster than np.unique on millions of strings
+    config_idx, configs = pd.factorize(_column(data, 'config'), sort=True)
+    instance_idx, instances = pd.factorize(_column(data, 'instance'), sort=True)
+    configs, instances = np.asarray(configs, dtype=str), np.asarray(instances, dtype=str)
+    times = _column(data, time).astype(np.float64)
+    ok = np.isfinite(times) & (times <= timeout)
+    if solved is not None:
+        ok &= _flag(data, solved)
+    for limit in ('varfile_timeout', 'varfile_memout'):
+        if limit in data:
+            ok &= ~_flag(data, limit)
+    scores = np.where(ok, times, k * timeout)
+
+    nc, ni = len(configs), len(instances)
+    pair = config_idx * ni + instance_idx
+    runs = np.bincount(pair, minlength=nc * ni).reshape(nc, ni)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_scores = np.bincount(pair, weights=scores, minlength=nc * ni).reshape(nc, ni) / runs
+        solved_fraction = np.bincount(pair, weights=ok, minlength=nc * ni).reshape(nc, ni) / runs
+    return ScoreMatrix(configs, instances, mean_scores, solved_fraction, runs, timeout, k)
+
+
+def virtual_best(matrix: ScoreMatrix) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per instance score of the virtual best and the virtual worst solver.
+    """
+    with np.errstate(invalid='ignore'):
+        return np.nanmin(matrix.scores, axis=0), np.nanmax(matrix.scores, axis=0)
+
+
+def ranks(matrix: ScoreMatrix) -> np.ndarray:
+    """
+    Per instance rank of each config (1 is best, ties get the average rank, NaN if a config has no run).
+    """
+    s = matrix.scores
+    missing = np.isnan(s)
+    s = np.where(missing, np.inf, s)
+    # sort each instance column, memory stays linear in the number of configs
+    order = np.argsort(s, axis=0, kind='stable')
+    sorted_scores = np.take_along_axis(s, order, axis=0)
+    positions = np.broadcast_to(np.arange(len(s))[:, None], s.shape)
+    new_group = np.ones(s.shape, dtype=bool)
+    new_group[1:] = sorted_scores[1:] != sorted_scores[:-1]
+    last_in_group = np.ones(s.shape, dtype=bool)
+    last_in_group[:-1] = new_group[1:]
+    # first and last position of the group of ties of each position
+    first = np.maximum.accumulate(np.where(new_group, positions, 0), axis=0)
+    last = np.flip(np.minimum.accumulate(np.flip(np.where(last_in_group, positions, len(s)), axis=0), axis=0), axis=0)
+    r = np.empty(s.shape)
+    np.put_along_axis(r, order, 1 + (first + last) / 2, axis=0)
+    return np.where(missing, np.nan, r)
+
+
+def bootstrap_ci(matrix: ScoreMatrix, config_a: str, config_b: str, samples: int = 10000,
+                 confidence: float = 0.95, seed: Optional[int] = None) -> Tuple[float, float, float]:
+    """
+    Mean difference of the PAR-k scores of config_a and config_b over their common instances and its bootstrap
+    confidence interval (instances are resampled).
+    """
+    a = matrix.scores[np.flatnonzero(matrix.configs == config_a)[0]]
+    b = matrix.scores[np.flatnonzero(matrix.configs == config_b)[0]]
+    diff = (a - b)[~(np.isnan(a) | np.isnan(b))]
+    if len(diff) == 0:
+        return np.nan, np.nan, np.nan
+    rng = np.random.default_rng(seed)
+    means = []
+    batch = max(1, BOOTSTRAP_BATCH // len(diff))
+    for start in range(0, samples, batch):
+        idx = rng.integers(0, len(diff), size=(min(batch, samples - start), len(diff)))
+        means.append(diff[idx].mean(axis=1))
+    means = np.concatenate(means)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(means, [alpha, 1 - alpha])
+    return float(diff.mean()), float(low), float(high)
+
+
+def summary(data, timeout: float, k: float = 10, time: str = 'runsolver_cpu_time',
+            solved: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Per config the number of runs, solved runs, PAR-k score and mean rank over the instances, plus the
+    virtual best and virtual worst solver.
+    """
+    matrix = score_matrix(data, timeout, k, time, solved)
+    config_ranks = ranks(matrix)
+    result = {}
+    par = f'par{k:g}'
+    with np.errstate(invalid='ignore'):
+        for c, config in enumerate(matrix.configs):
+            runs = matrix.runs[c]
+            result[str(config)] = {
+                'runs': int(runs.sum()),
+                'solved': int(np.round(np.nansum(matrix.solved[c] * runs))),
+                par: float(np.nansum(matrix.scores[c] * runs) / runs.sum()),
+                'mean_rank': float(np.nanmean(config_ranks[c])),
+            }
+        # the virtual best (worst) solver solves an instance if some (every) config solved all its runs on it, the
+        # scores cannot tell this as an unsolved run scores the timeout with k = 1 and the scores are averaged
+        virtual_solved = [np.nanmax(matrix.solved, axis=0), np.nanmin(matrix.solved, axis=0)]
+        for name, scores, solved_fraction in zip(['virtual_best', 'virtual_worst'], virtual_best(matrix),
+                                                 virtual_solved):
+            result[name] = {
+                'runs': len(scores),
+                'solved': int((solved_fraction == 1).sum()),
+                par: float(np.nanmean(scores)),
+                'mean_rank': np.nan,
+            }
+    return result
@@ -1,17 +1,27 @@
 #!/usr/bin/false
 import argparse
 import datetime
+import importlib
 import json
 import math
 import os
 import random
 import re
+import shlex
 import stat
+import sys
 import uuid
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Union
+from typing import Optional, Union, List, Tuple, Dict, Any
 from .utils import query_yes_no
+from .instance_store import build_instance_store
+from .catalog import (CATALOG_FILE, build_catalog, read_catalog, instance_demand, write_catalog, compression_type,
+                      uncompressed_size)
+from .ordering import TASK_ORDERS, RuntimeModel, task_order
+from .result_store import FileHasher, ResultStore
 
 import jinja2
 
@@ -29,6 +39,35 @@ PERF_EVENTS = [
     'context-switches'
 ]
 
+FILE_FOLDER_REGEX = re.compile(r"\$(file|folder){([^}]*)}")
+FILE_REGEX = re.compile(r"\$file{([^}]*)}")
+FOLDER_REGEX = re.compile(r"\$folder{([^}]*)}")
+ARG_REGEX = re.compile(r"\$[1-9][0-9]*")
+TIMEOUT_REGEX = re.compile(r"\$timeout")
+SEED_REGEX = re.compile(r"\$seed")
+INSTANCE_SPLIT_REGEX = re.compile('[;, ]')
+COMPRESSED_SUFFIXES = ('.lzma', '.zip', '.gz', '.xz', '.bz2')
+
+# start scripts are rendered once per config/instance pair, these placeholders are then replaced for each run
+SHM_UID_PLACEHOLDER = '__COPPERBENCH_SHM_UID__'
+SEED_PLACEHOLDER = '__COPPERBENCH_SEED__'
+RUN_PLACEHOLDER = '__COPPERBENCH_RUN__'
+RESULT_ENTRY_PLACEHOLDER = '__COPPERBENCH_RESULT_ENTRY__'
+TASK_PLACEHOLDER = '__COPPERBENCH_TASK__'
+
+WRITE_BATCH_SIZE = 256
+
+# file extension, command compressing a single run and command decompressing a chunk of the incremental archive
+ARCHIVE_CODECS = {
+    'gzip': ('gz', 'gzip -1', 'gzip -dc'),
+    'zstd': ('zst', 'zstd -q -c', 'zstd -dcq'),
+}
+ARCHIVE_SHARDS = {
+    'config': 'config*',
+    'instance': 'config*/instance*',
+}
+RESOURCE_BACKENDS = ['runsolver', 'cgroup']
+
 
 @dataclass
 class BenchConfig:
@@ -64,38 +103,396 @@ class BenchConfig:
     warn_large_task_num: Optional[bool] = True
     instances_are_parameters: Optional[bool] = False
     data_to_main_mem = True
+    generation_workers: Optional[int] = None
+    manifest_mode: bool = False
+    stage_cache: bool = False
+    stage_cache_dir: str = '/dev/shm/copperbench_cache_$USER'
+    stage_cache_budget: int = 8192
+    predecompress: bool = False
+    instance_store: Optional[str] = None
+    instance_store_codec: Optional[str] = None
+    predecompress_workers: Optional[int] = None
+    tasks_per_array_element: Optional[int] = None
+    array_element_time: Optional[int] = None
+    whole_node: bool = False
+    num_nodes: Optional[int] = None
+    archive_codec: str = 'gzip'
+    archive_cpus: int = 1
+    archive_shards: Optional[str] = None
+    incremental_archive: bool = False
+    archive_chunk_size: int = 100
+    instance_catalog: bool = False
+    catalog_workers: Optional[int] = None
+    deduplicate_instances: bool = False
+    task_order: str = 'nested'
+    status_journal: bool = False
+    result_store: Optional[str] = None
+    lean_runner: bool = False
+    log_codec: Optional[str] = None
+    log_cap: Optional[int] = None
+    resource_backend: str = 'runsolver'
+    sample_interval: Optional[float] = None
+    sample_events: Optional[List[str]] = None
+    runtime_estimates: Optional[str] = None
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
-                                     description=f'copperbench (version {__version__})')
-    parser.add_argument('bench_config_file')
-    args = parser.parse_args()
+@dataclass
+class ParsedConfig:
+    name: str
+    line: int
+    cmd: str
+    shm_files: List[Tuple[Union[Path, str], Path]] = field(default_factory=list)
 
-    bench_config_dir = os.path.dirname(os.path.realpath(args.bench_config_file))
-    with open(os.path.realpath(args.bench_config_file)) as fh:
-        bench_config = BenchConfig(**json.loads(fh.read()))
 
-    starthome = os.path.realpath(Path.home())
-    templateLoader = jinja2.FileSystemLoader(searchpath=f"{os.path.dirname(__file__)}/templates/")
-    templateEnv = jinja2.Environment(loader=templateLoader)
+@dataclass
+class ParsedInstance:
+    name: str
+    line: int
+    input_line: str
+    shm_files: List[Tuple[Union[Path, str], Path]] = field(default_factory=list)
+    uncompress: List[Tuple[Path, Path]] = field(default_factory=list)
+    cmd_args: list = field(default_factory=list)
+    stored: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+@lru_cache(maxsize=None)
+def resolve_path(path: str, base_dir: str, working_dir: Optional[str]) -> str:
+    if is_abs_path(path):
+        return os.path.realpath(os.path.expanduser(path))
+    elif working_dir is not None:
+        return os.path.realpath(os.path.expanduser(Path('~', working_dir, path)))
+    else:
+        return os.path.realpath(os.path.join(base_dir, path))
+
+
+@lru_cache(maxsize=None)
+def home_relative_path(path: str, base_dir: str, working_dir: Optional[str], starthome: str) -> Path:
+    return Path('~', os.path.relpath(resolve_path(path, base_dir, working_dir), start=starthome))
 
+
+@lru_cache(maxsize=None)
+def is_abs_path(path: str) -> bool:
+    return os.path.isabs(os.path.expanduser(path))
+
+
+def read_list_file(path: str, count_skipped: bool, prefix: str) -> Dict[str, str]:
+    entries = {}
+    with open(path) as file:
+        i = 1
+        for line in file:
+            entry = line.strip()
+            if not entry.startswith('#') and len(entry) > 0:
+                entries[f'{prefix}{i}'] = entry
+                i += 1
+            elif count_skipped:
+                i += 1
+    return entries
+
+
+def parse_config(name: str, line: int, config: str, bench_config: BenchConfig, bench_config_dir: str,
+                 working_dir: Optional[str], starthome: str, shm_dir: Path) -> ParsedConfig:
+    config = "" if config == "None" else config
+    cmd = ''
+    if bench_config.executable is not None:
+        cmd += bench_config.executable
+        cmd += ' '
+    cmd += config
+
+    parsed = ParsedConfig(name, line, cmd)
+    for m in FILE_FOLDER_REGEX.finditer(cmd):
+        folder = m.group(1) == 'folder'
+        path = m.group(2)
+
+        if is_abs_path(path):
+            path = Path(path)
+        else:
+            path = home_relative_path(path, bench_config_dir, working_dir, starthome)
+        if folder:
+            shm_path = Path(shm_dir, 'input')
+            path = os.path.dirname(path)
+            parsed.shm_files.append((f'-r {path}/*', shm_path))
+        else:
+            if str(path).startswith('~'):
+                shm_path = Path(shm_dir, 'input', os.path.basename(path))
+            else:
+                path = Path('~', os.path.relpath(os.path.expanduser(path), start=starthome))
+                shm_path = Path(shm_dir, 'input', path)
+            parsed.shm_files.append((path, shm_path))
+    return parsed
+
+
+def instance_files(input_line: str) -> List[str]:
+    return INSTANCE_SPLIT_REGEX.split(input_line)
+
+
+def parse_instance(name: str, line: int, input_line: str, bench_config: BenchConfig, instancelist_dir: str,
+                   working_dir: Optional[str], starthome: str, shm_dir: Path,
+                   store: Optional[Dict[str, Dict[str, Any]]] = None) -> ParsedInstance:
+    parsed = ParsedInstance(name, line, input_line)
+    collected = {}
+    for e in instance_files(input_line):
+        if bench_config.instances_are_parameters:
+            parsed.cmd_args.append(e)
+            continue
+        if e in collected.keys() and collected[e] != os.path.realpath(e):
+            print(
+                f'Instance {e} was already added. Instances of the same name from different paths are '
+                f'currently not supported! Exiting...')
+            exit(2)
+        collected[e] = os.path.realpath(e)
+
+        stored = None
+        if store is not None and e.lower().endswith(COMPRESSED_SUFFIXES):
+            stored = store[resolve_path(e, instancelist_dir, working_dir)]
+            parsed.stored[e] = stored
+
+        if stored is not None:
+            # use the pre-decompressed file of the instance store instead
+            instance_path = Path('~', os.path.relpath(stored['path'], start=starthome))
+            shm_path = Path(shm_dir, 'input', os.path.basename(stored['path']))
+            parsed.shm_files.append((instance_path, shm_path))
+            if stored['codec'] is not None:
+                shm_path_uncompr = Path(shm_dir, 'input', os.path.basename(os.path.splitext(e)[0]))
+                parsed.uncompress.append((shm_path, shm_path_uncompr))
+                parsed.cmd_args.append(shm_path_uncompr)
+            else:
+                parsed.cmd_args.append(shm_path)
+            continue
+
+        if is_abs_path(e):
+            instance_path = Path(e)
+        else:
+            instance_path = home_relative_path(e, instancelist_dir, working_dir, starthome)
+
+        shm_path = Path(shm_dir, 'input', os.path.basename(e))
+        parsed.shm_files.append((Path(instance_path), shm_path))
+
+        if e.lower().endswith(COMPRESSED_SUFFIXES):
+            shm_path_uncompr = Path(shm_dir, 'input', os.path.basename(os.path.splitext(e)[0]))
+            parsed.uncompress.append((shm_path, shm_path_uncompr))
+            parsed.cmd_args.append(shm_path_uncompr)
+        else:
+            parsed.cmd_args.append(shm_path)
+    return parsed
+
+
+def build_command(config: ParsedConfig, instance: ParsedInstance, bench_config: BenchConfig, config_path: str,
+                  instancelist_filename: str) -> Tuple[str, list]:
+    """
+    Substitutes instances, files and the timeout into the command of a config/instance pair.
+    The seed is left as SEED_PLACEHOLDER, so that the result can be reused for every run.
+    """
+    cmd = config.cmd
+    cmd_instances_used = set()
+    for m in ARG_REGEX.finditer(cmd):
+        grp = m.group(0)
+        idx = int(grp[1:])
+        try:
+            cmd = cmd.replace(grp, f'{instance.cmd_args[idx - 1]}')
+        except IndexError as _:
+            print(
+                f"Config: '{os.path.basename(config_path)}:L{config.line}' contained '${idx}', "
+                f"but instance '{instancelist_filename}:L{instance.line}' "
+                f"was missing an argument ${idx}.\n........Content was '{instance.input_line}'.")
+            print(f"Exiting!")
+            exit(2)
+        cmd_instances_used.add(idx - 1)
+
+    for j, v in enumerate(instance.cmd_args):
+        if j in cmd_instances_used:
+            continue
+        cmd += f' {v}'
+
+    shm_files = config.shm_files + instance.shm_files
+    occ = {}
+    for j, (p, sp) in enumerate(shm_files):
+        if sp.name in occ:
+            new_name = f'{sp.stem}{occ[sp.name]}{sp.suffix}'
+            shm_files[j] = (p, sp.with_name(new_name))
+            occ[sp.name] += 1
+        else:
+            occ[sp.name] = 1
+
+    for _, f in shm_files:
+        cmd = FILE_REGEX.sub(str(f), cmd, 1)
+        repl = ''
+        for m in FOLDER_REGEX.finditer(cmd):
+            repl = f"{str(f)}/{os.path.basename(m.group(1))}"
+            break
+        cmd = FOLDER_REGEX.sub(repl, cmd, 2)
+
+    cmd = TIMEOUT_REGEX.sub(str(bench_config.timeout * bench_config.timeout_factor), cmd)
+    cmd = SEED_REGEX.sub(SEED_PLACEHOLDER, cmd)
+    return cmd, shm_files
+
+
+def executable_mode() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return (0o666 & ~umask) | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH
+
+
+def _write_scripts(batch: List[Tuple[Path, str]], mode: int) -> None:
+    for job_path, text in batch:
+        os.makedirs(job_path.parent, exist_ok=True)
+        with open(job_path, 'w') as fh:
+            fh.write(text)
+            os.fchmod(fh.fileno(), mode)
+
+
+class ScriptWriter:
+    """
+    Writes start scripts in batches through a thread pool, so that file system latency (e.g. NFS) is overlapped
+    with the generation of the next scripts.
+    """
+
+    def __init__(self, workers: Optional[int] = None, batch_size: int = WRITE_BATCH_SIZE):
+        if workers is None:
+            workers = min(32, (os.cpu_count() or 1) + 4)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.max_pending = 4 * workers
+        self.batch_size = batch_size
+        self.mode = executable_mode()
+        self.batch = []
+        self.pending = []
+
+    def write(self, job_path: Path, text: str) -> None:
+        self.batch.append((job_path, text))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if len(self.batch) > 0:
+            self.pending.append(self.executor.submit(_write_scripts, self.batch, self.mode))
+            self.batch = []
+        # bound the number of rendered scripts held in memory
+        while len(self.pending) > self.max_pending:
+            self.pending.pop(0).result()
+
+    def close(self) -> None:
+        self.flush()
+        for f in self.pending:
+            f.result()
+        self.pending = []
+        self.executor.shutdown()
+
+
+def shell_quote(value: str) -> str:
+    """
+    Quotes a value for a task table row, the shm uid placeholder is replaced by the variable set by the runner.
+    """
+    return '"${shm_uid}"'.join(shlex.quote(p) for p in value.split(SHM_UID_PLACEHOLDER))
+
+
+def stage_commands(shm_files: list, uncompress: list, stage_cache: bool) -> Tuple[List[str], List[str]]:
+    """
+    Returns the shell commands copying the inputs into shared memory and uncompressing them.
+    """
+    copy_cmds = []
+    for orig_path, shm_path in shm_files:
+        # folders are always copied directly
+        if stage_cache and not str(orig_path).startswith('-r '):
+            copy_cmds.append(f'stage_file {orig_path} {shm_path}')
+        else:
+            copy_cmds.append(f'cp {orig_path} {shm_path}')
+    uncompress_cmd = 'stage_uncompressed' if stage_cache else 'uncompress'
+    uncompress_cmds = [f'{uncompress_cmd} {shm_path} {shm_path_uncompr}' for shm_path, shm_path_uncompr in uncompress]
+    return copy_cmds, uncompress_cmds
+
+
+def manifest_row(log_folder: str, input_line: str, cmd_dir: str, stage_cmds: List[str], cmd: str,
+                 result_entry: Optional[str] = None) -> str:
+    entry = f'result_entry={result_entry}; ' if result_entry is not None else ''
+    # a leading ~ is not expanded inside quotes
+    if cmd_dir == '~' or cmd_dir.startswith('~/'):
+        cmd_dir = '"$HOME"' + (f'/{shell_quote(cmd_dir[2:])}' if len(cmd_dir) > 2 else '')
+    else:
+        cmd_dir = shell_quote(cmd_dir)
+    return (f'log_folder="$HOME"/{shlex.quote(log_folder)}; input_line={shlex.quote(input_line)}; '
+            f'cmd_dir={cmd_dir}; stage_cmds={shell_quote("; ".join(stage_cmds))}; {entry}'
+            f'solver_cmd={shell_quote(cmd)}\n')
+
+
+class TaskTable:
+    """
+    Task table of the manifest mode. Each row holds the shell assignments describing one run and the index stores
+    the byte offset of every row in fixed width records, so that the runner finds task N with a single seek.
+    """
+    INDEX_WIDTH = 16
+
+    def __init__(self, base_path: Path):
+        self.rows = open(base_path / 'task_table.txt', 'wb')
+        self.index_path = base_path / 'task_table.idx'
+        self.offsets = []
+        self.offset = 0
+
+    def write(self, row: str) -> None:
+        data = row.encode()
+        self.offsets.append(self.offset)
+        self.rows.write(data)
+        self.offset += len(data)
+
+    def close(self, order: Optional[List[int]] = None) -> None:
+        """
+        Writes the index, optionally in a different order of the rows, i.e. task N is row order[N - 1].
+        """
+        self.rows.close()
+        if order is None:
+            order = range(len(self.offsets))
+        with open(self.index_path, 'wb') as index:
+            index.write(b''.join(f'{self.offsets[i]:0{self.INDEX_WIDTH - 1}d}\n'.encode() for i in order))
+
+
+def array_element_tasks(bench_config: BenchConfig, slurm_time: int) -> int:
+    """
+    Number of runs executed sequentially by each element of the slurm job array.
+    """
+    if bench_config.tasks_per_array_element is not None:
+        return max(1, bench_config.tasks_per_array_element)
+    elif bench_config.array_element_time is not None:
+        return max(1, bench_config.array_element_time // slurm_time)
+    return 1
+
+
+def render_whole_node(templateEnv: jinja2.Environment, bench_config: BenchConfig, cpus: int, slurm_time: int,
+                      num_tasks: int, **kwargs) -> str:
+    """
+    Renders the job allocating whole nodes, each node runs one slot per disjoint set of cpus (i.e. memory lines)
+    which pulls the next task from the start list until no task is left or the time limit approaches. The slots are
+    built from the topology of the node at job start.
+    """
+    num_slots = max(1, bench_config.cpus_per_node // cpus)
+    node_time = max(slurm_time, bench_config.array_element_time or slurm_time)
+    if bench_config.num_nodes is not None:
+        num_nodes = bench_config.num_nodes
+    else:
+        num_nodes = max(1, math.ceil(num_tasks / (num_slots * (node_time // slurm_time))))
+    template = templateEnv.get_template('whole_node.slurm.jinja2')
+    return template.render(slurm_timeout=datetime.timedelta(seconds=node_time), partition=bench_config.partition,
+                           cpus_per_node=bench_config.cpus_per_node, max_parallel_jobs=bench_config.max_parallel_jobs,
+                           num_nodes=num_nodes, node_time=node_time, slurm_time=slurm_time, num_tasks=num_tasks,
+                           cpus=cpus, num_slots=num_slots, **kwargs)
+
+
+def resolve_working_dir(bench_config: BenchConfig, bench_config_dir: str, starthome: str) -> Optional[str]:
     working_dir = None
     if bench_config.working_dir is not None:
         if (os.path.isabs(bench_config.working_dir) or
                 (isinstance(bench_config.working_dir, str) and bench_config.working_dir.startswith('~'))):
             working_dir = os.path.expanduser(bench_config.working_dir)
         else:
-            wd = Path(os.path.dirname(args.bench_config_file), bench_config.working_dir)
+            wd = Path(bench_config_dir, bench_config.working_dir)
             working_dir = os.path.relpath(os.path.realpath(wd), start=starthome)
+    return working_dir
 
-    if bench_config.initial_seed is not None:
-        random.seed(bench_config.initial_seed)
 
-    cpus = int(math.ceil(bench_config.request_cpus / (bench_config.cpus_per_node / bench_config.mem_lines))
+def task_cpus(bench_config: BenchConfig) -> int:
+    # cpus are requested in whole memory lines
+    return int(math.ceil(bench_config.request_cpus / (bench_config.cpus_per_node / bench_config.mem_lines))
                * (bench_config.cpus_per_node / bench_config.mem_lines))
-    cache_lines = int(cpus / bench_config.mem_lines)
 
+
+def instance_list_files(bench_config: BenchConfig) -> Dict[str, str]:
     instance_conf = bench_config.instances
     instance_dict = {}
     if isinstance(instance_conf, str):
@@ -105,11 +502,230 @@ def main() -> None:
             instance_dict[f'{bench_config.name}_{os.path.splitext(e)[0]}'] = e
     elif isinstance(instance_conf, dict):
         instance_dict = instance_conf
+    return instance_dict
+
+
+def config_list_files(bench_config: BenchConfig, verbose: bool = False) -> Dict[str, str]:
+    bench_config_dict = {}
+    if isinstance(bench_config.configs, str):
+        bench_config_dict[bench_config.name] = bench_config.configs
+    elif isinstance(bench_config.configs, list):
+        for e in bench_config.configs:
+            bench_config_dict[f'{bench_config.name}_{os.path.splitext(e)[0]}'] = e
+    elif isinstance(bench_config.configs, dict):
+        for k, v in bench_config.configs.items():
+            if k == '':
+                if verbose:
+                    print(f'...Skipping config "{k}": "{v}" (name empty).')
+                continue
+            elif k.startswith('#'):
+                if verbose:
+                    print(f'...Skipping config "{k}": "{v}" (name starts with #).')
+                continue
+            bench_config_dict[k] = v
+    return bench_config_dict
+
+
+def list_path(list_file: str, bench_config_dir: str) -> str:
+    return list_file if os.path.isabs(list_file) else f'{bench_config_dir}/{list_file}'
+
+
+def count_tasks(bench_config: BenchConfig, bench_config_dir: str) -> int:
+    """
+    Number of tasks of a benchmark, only the config and instance lists are read.
+    """
+    num_configs = sum(sum(1 for _ in read_list_file(list_path(f, bench_config_dir), True, 'config'))
+                      for f in config_list_files(bench_config).values())
+    tasks = 0
+    for name, instance_file in instance_list_files(bench_config).items():
+        if name.startswith('%') or name.startswith('#') or instance_file.startswith('%') or instance_file.startswith('#'):
+            continue
+        instances = read_list_file(list_path(instance_file, bench_config_dir), False, 'instance').values()
+        tasks += sum(1 for l in instances if not l.startswith('%')) * num_configs * bench_config.runs
+    return tasks
+
+
+def estimate(bench_config: BenchConfig, bench_config_dir: str, nodes: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Cost of a benchmark computed from the config and instance lists without generating anything.
+    Only the number of lines is needed per list, so this is fast for any number of tasks.
+    """
+    working_dir = resolve_working_dir(bench_config, bench_config_dir, os.path.realpath(Path.home()))
+    cpus = task_cpus(bench_config)
+    slurm_time = bench_config.timeout + bench_config.slurm_time_buffer + bench_config.runsolver_kill_delay
+    num_configs = [sum(1 for _ in read_list_file(list_path(f, bench_config_dir), True, 'config'))
+                   for f in config_list_files(bench_config).values()]
+
+    tasks = 0
+    pairs = 0
+    shm_demand = 0
+    unknown_sizes = 0
+    missing = 0
+    file_sizes = {}
+    for name, instance_file in instance_list_files(bench_config).items():
+        if name.startswith('%') or name.startswith('#') or instance_file.startswith('%') or instance_file.startswith('#'):
+            continue
+        instance_path = list_path(instance_file, bench_config_dir)
+        instances = [l for l in read_list_file(instance_path, False, 'instance').values() if not l.startswith('%')]
+        pairs += len(instances) * sum(num_configs)
+        tasks += len(instances) * sum(num_configs) * bench_config.runs
+        if bench_config.instances_are_parameters:
+            continue
+        for input_line in instances:
+            demand = 0
+            for e in instance_files(input_line):
+                path = resolve_path(e, os.path.dirname(instance_path), working_dir)
+                if path not in file_sizes:
+                    try:
+                        size = os.path.getsize(path)
+                        compression = compression_type(path)
+                        file_sizes[path] = (size, uncompressed_size(path, compression, size) if compression else 0)
+                        if file_sizes[path][1] is None:
+                            unknown_sizes += 1
+                    except OSError:
+                        missing += 1
+                        file_sizes[path] = (0, 0)
+                size, uncompressed = file_sizes[path]
+                demand += size + (uncompressed or 0)
+            shm_demand = max(shm_demand, demand)
+
+    # the run folder, start.sh (unless manifest mode), the logs touched by start.sh and 00_finished.log
+    run_files = 8 if bench_config.manifest_mode else 9
+    inodes = tasks * run_files + pairs + sum(num_configs)
+    slots = max(1, bench_config.cpus_per_node // cpus)
+    parallel = None
+    if nodes is not None:
+        parallel = nodes * slots
+    if bench_config.max_parallel_jobs is not None:
+        parallel = min(parallel or bench_config.max_parallel_jobs, bench_config.max_parallel_jobs)
+    return {
+        'tasks': tasks,
+        'cpus_per_task': cpus,
+        'slurm_time': slurm_time,
+        'core_hours': tasks * cpus * slurm_time / 3600,
+        'inodes': inodes,
+        # every file occupies at least one 4 KiB block
+        'disk_bytes': inodes * 4096,
+        'shm_peak_per_node': shm_demand * slots if not bench_config.instances_are_parameters else None,
+        'shm_unknown_files': unknown_sizes,
+        'missing_files': missing,
+        'parallel_tasks': parallel,
+        'makespan': math.ceil(tasks / parallel) * slurm_time if parallel is not None else slurm_time,
+    }
+
+
+def print_estimate(est: Dict[str, Any]) -> None:
+    print(f'Tasks: {est["tasks"]} with {est["cpus_per_task"]} cpus and a slurm time of {est["slurm_time"]} s each.')
+    print(f'...Worst-case cost: {est["core_hours"]:.1f} core-hours.')
+    print(f'...Files: {est["inodes"]} inodes, at least {est["disk_bytes"] / 2 ** 30:.2f} GiB on disk.')
+    if est['shm_peak_per_node'] is not None:
+        unknown = (f' plus the decompressed size of {est["shm_unknown_files"]} files'
+                   if est['shm_unknown_files'] > 0 else '')
+        print(f'...Peak /dev/shm demand per node: {est["shm_peak_per_node"] / 2 ** 20:.1f} MiB{unknown}.')
+    if est['missing_files'] > 0:
+        print(f'...WARNING: {est["missing_files"]} instance files do not exist.')
+    if est['parallel_tasks'] is not None:
+        print(f'...Worst-case makespan with {est["parallel_tasks"]} parallel tasks: '
+              f'{datetime.timedelta(seconds=est["makespan"])}.')
+    else:
+        print(f'...Worst-case makespan if all tasks run in parallel: {datetime.timedelta(seconds=est["makespan"])} '
+              f'(pass --nodes or set max_parallel_jobs for a better estimate).')
+
+
+def generate(bench_config: BenchConfig, bench_config_dir: str,
+             templateEnv: Optional[jinja2.Environment] = None) -> Tuple[int, Optional[Union[Path, str]]]:
+    """
+    Generates all benchmark folders for the given config and returns the number of generated tasks
+    as well as the path of the last generated start script.
+    """
+    starthome = os.path.realpath(Path.home())
+    if templateEnv is None:
+        templateLoader = jinja2.FileSystemLoader(searchpath=f"{os.path.dirname(__file__)}/templates/")
+        templateEnv = jinja2.Environment(loader=templateLoader)
+    start_template = templateEnv.get_template('start.sh.jinja2')
+
+    working_dir = resolve_working_dir(bench_config, bench_config_dir, starthome)
+
+    if bench_config.initial_seed is not None:
+        random.seed(bench_config.initial_seed)
+
+    cpus = task_cpus(bench_config)
+    cache_lines = int(cpus / bench_config.mem_lines)
+
+    instance_conf = bench_config.instances
+    instance_dict = instance_list_files(bench_config)
+    bench_config_dict = config_list_files(bench_config, verbose=True)
 
     rs_time = bench_config.timeout + bench_config.slurm_time_buffer
     slurm_time = rs_time + bench_config.runsolver_kill_delay
-    warn_large_task_num = bench_config.warn_large_task_num
+    events_str = ','.join(PERF_EVENTS)
+    symlink_working_dir = working_dir is not None and bench_config.symlink_working_dir
+    if bench_config.data_to_main_mem:
+        shm_dir = Path(f'/dev/shm/{SHM_UID_PLACEHOLDER}/')
+    else:
+        shm_dir = Path(f'/tmp/{SHM_UID_PLACEHOLDER}/')
+    runsolver_str = Path(shm_dir, 'input', Path(bench_config.runsolver_path).name)
+    if bench_config.archive_codec not in ARCHIVE_CODECS:
+        print(f'Unknown archive_codec "{bench_config.archive_codec}" '
+              f'(supported: {", ".join(ARCHIVE_CODECS)}). Exiting...')
+        exit(2)
+    if bench_config.archive_shards is not None and bench_config.archive_shards not in ARCHIVE_SHARDS:
+        print(f'Unknown archive_shards "{bench_config.archive_shards}" '
+              f'(supported: {", ".join(ARCHIVE_SHARDS)}). Exiting...')
+        exit(2)
+    archive_ext, archive_compress, _ = ARCHIVE_CODECS[bench_config.archive_codec]
+    if bench_config.log_codec is not None and bench_config.log_codec not in ARCHIVE_CODECS:
+        print(f'Unknown log_codec "{bench_config.log_codec}" (supported: {", ".join(ARCHIVE_CODECS)}). Exiting...')
+        exit(2)
+    if bench_config.resource_backend not in RESOURCE_BACKENDS:
+        print(f'Unknown resource_backend "{bench_config.resource_backend}" '
+              f'(supported: {", ".join(RESOURCE_BACKENDS)}). Exiting...')
+        exit(2)
+    if bench_config.sample_interval is not None and bench_config.sample_interval <= 0:
+        print('sample_interval has to be positive. Exiting...')
+        exit(2)
+    if bench_config.log_cap is not None and bench_config.log_cap <= 0:
+        print('log_cap has to be positive. Exiting...')
+        exit(2)
+    log_ext, log_compress, _ = ARCHIVE_CODECS.get(bench_config.log_codec, (None, None, None))
+    if bench_config.task_order not in TASK_ORDERS:
+        print(f'Unknown task_order "{bench_config.task_order}" (supported: {", ".join(TASK_ORDERS)}). Exiting...')
+        exit(2)
+    ordered = bench_config.task_order != 'nested'
+    runtime_model = None
+    if ordered and bench_config.runtime_estimates is not None:
+        estimates_path = bench_config.runtime_estimates
+        if not os.path.isabs(os.path.expanduser(estimates_path)):
+            estimates_path = Path(bench_config_dir, estimates_path)
+        runtime_model = RuntimeModel(os.path.expanduser(estimates_path))
+        print(f'...Ordering tasks by the runtimes of {len(runtime_model)} config/instance pairs of '
+              f'{os.path.realpath(estimates_path)}.')
+    elif ordered and bench_config.instances_are_parameters:
+        print('Ordering tasks without runtime_estimates requires instance files (instances_are_parameters). Exiting...')
+        exit(2)
+    start_args = dict(working_dir=working_dir, symlink_working_dir=symlink_working_dir,
+                      use_perf=bench_config.use_perf, perf_events=events_str, perf_prefix=PERF_PREFIX,
+                      rs_time=rs_time, mem_limit=bench_config.mem_limit,
+                      runsolver_kill_delay=bench_config.runsolver_kill_delay, cmd_cwd=bench_config.cmd_cwd,
+                      starexec=bench_config.starexec_compatible, python_conda_env=bench_config.python_conda_env,
+                      stage_cache=bench_config.stage_cache, stage_cache_dir=bench_config.stage_cache_dir,
+                      stage_cache_budget=bench_config.stage_cache_budget,
+                      incremental_archive=bench_config.incremental_archive,
+                      archive_chunk_size=bench_config.archive_chunk_size,
+                      archive_ext=archive_ext, archive_compress=archive_compress,
+                      status_journal=bench_config.status_journal, lean_runner=bench_config.lean_runner,
+                      cgroup=bench_config.resource_backend == 'cgroup',
+                      sample_interval=bench_config.sample_interval,
+                      sample_events=bench_config.sample_events if bench_config.sample_interval is not None else None,
+                      log_filter=bench_config.log_codec is not None or bench_config.log_cap is not None,
+                      log_compress=log_compress, log_ext=f'.{log_ext}' if log_ext is not None else '',
+                      # half of the cap is kept from the head and half from the tail of the output
+                      log_keep=bench_config.log_cap * 2 ** 19 if bench_config.log_cap is not None else None)
 
+    num_tasks = 0
+    job_path = None
+    writer = ScriptWriter(bench_config.generation_workers)
+    instance_sets = []
     for instanceset_name, instancelist_filename in instance_dict.items():
         if (instanceset_name.startswith("%") or instanceset_name.startswith("#") or
                 instancelist_filename.startswith("%") or instancelist_filename.startswith("#")):
@@ -118,302 +734,346 @@ def main() -> None:
             instance_path = instancelist_filename
         else:
             instance_path = f'{bench_config_dir}/{instancelist_filename}'
+        instances = read_list_file(instance_path, False, 'instance')
+        instance_sets.append((instanceset_name, instancelist_filename, os.path.dirname(instance_path), instances))
 
-        instancelist_dir = os.path.dirname(instance_path)
-
-        instances = {}
-        with open(instance_path) as file:
-            i = 1
-            for line in file:
-                instance = line.strip()
-                if not instance.startswith('#') and len(instance) > 0:
-                    instances[f'instance{i}'] = instance
-                    i += 1
-
-        bench_config_dict = {}
-        if isinstance(bench_config.configs, str):
-            bench_config_dict[bench_config.name] = bench_config.configs
-        elif isinstance(bench_config.configs, list):
-            for e in bench_config.configs:
-                bench_config_dict[f'{bench_config.name}_{os.path.splitext(e)[0]}'] = e
-        elif isinstance(bench_config.configs, dict):
-            for k,v in bench_config.configs.items():
-                if k == '':
-                    print(f'...Skipping config "{k}": "{v}" (name empty).')
-                    continue
-                elif k.startswith('#'):
-                    print(f'...Skipping config "{k}": "{v}" (name starts with #).')
-                    continue
-                bench_config_dict[k] = v
+    store = None
+    if bench_config.predecompress and not bench_config.instances_are_parameters:
+        sources = [resolve_path(e, instancelist_dir, working_dir)
+                   for _, _, instancelist_dir, instances in instance_sets
+                   for input_line in instances.values() if not input_line.startswith('%')
+                   for e in instance_files(input_line) if e.lower().endswith(COMPRESSED_SUFFIXES)]
+        store_dir = bench_config.instance_store
+        if store_dir is None:
+            store_dir = Path(bench_config.name).parent / f'{Path(bench_config.name).name}_instance_store'
+        store = build_instance_store(sources, store_dir, bench_config.instance_store_codec,
+                                     bench_config.predecompress_workers)
 
-        num_tasks=0
-        for bench_config_name, benchmark_config in bench_config_dict.items():
-            if os.path.isabs(benchmark_config):
-                config_path = benchmark_config
-            else:
-                config_path = f'{bench_config_dir}/{benchmark_config}'
-
-            configs = {}
-            with open(config_path) as file:
-                i = 1
-                for line in file:
-                    config = line.strip()
-                    if not config.startswith('#') and len(config) > 0:
-                        configs[f'config{i}'] = config
-                        i += 1
-                    else:
-                        i += 1
-
-            base_path = Path(bench_config.name)
-
-            if not isinstance(bench_config.configs, str):
-                base_path = base_path / bench_config_name
-
-            if not isinstance(instance_conf, str):
-                base_path = base_path / instanceset_name 
-
-            if os.path.exists(base_path):
-                if not bench_config.overwrite:
-                    print(f"Directory {os.path.realpath(base_path)} exists. Exiting...")
-                    exit(2)
-            else:
-                os.makedirs(base_path)
-
-            metadata = {'instances': instances, 'configs': configs}
-
-            start_scripts = []
-            config_line = 0
-            for config_name, config in configs.items():
-                config_line += 1
-                config = "" if config == "None" else config
-
-                instance_config_line = 0
-                for input_name, input_line in instances.items():
-                    instance_config_line += 1
-                    if input_line.startswith('#') or input_line.startswith('%'):
-                        continue
-                    for i in range(1, bench_config.runs + 1):
-                        log_folder = Path(base_path, config_name, input_name, f'run{i}')
-                        if os.path.exists(log_folder):
-                            if not bench_config.overwrite:
-                                print(f"Directory {os.path.realpath(log_folder)} exists. Exiting...")
-                                exit(2)
-                        else:
-                            os.makedirs(log_folder)
+    catalog = None
+    if ((bench_config.instance_catalog or bench_config.deduplicate_instances or (ordered and runtime_model is None))
+            and not bench_config.instances_are_parameters):
+        catalog_file = Path(bench_config.name, CATALOG_FILE)
+        sources = [resolve_path(e, instancelist_dir, working_dir)
+                   for _, _, instancelist_dir, instances in instance_sets
+                   for input_line in instances.values() if not input_line.startswith('%')
+                   for e in instance_files(input_line)]
+        try:
+            catalog = build_catalog(sources, read_catalog(catalog_file), bench_config.catalog_workers)
+        except FileNotFoundError as e:
+            print(f'Instance {e.filename} does not exist. Exiting...')
+            exit(2)
+        catalog_instances = {}
+        catalog_duplicates = {}
 
-                        job_file = 'start.sh'
-                        job_path = log_folder / job_file
+    result_store = None
+    if bench_config.result_store is not None:
+        # runs are only reused under the same limits and hardware settings
+        limits = {'timeout': bench_config.timeout, 'mem_limit': bench_config.mem_limit, 'cpus': cpus,
+                  'cpu_freq': bench_config.cpu_freq, 'partition': bench_config.partition}
+        result_store = ResultStore(bench_config.result_store, FileHasher(catalog), limits)
+        store_path = os.path.realpath(result_store.path)
+        if not os.path.relpath(store_path, start=starthome).startswith('..'):
+            store_path = Path('~', os.path.relpath(store_path, start=starthome))
+        start_args['result_store'] = store_path
 
-                        shm_uid = uuid.uuid1()
-                        if bench_config.data_to_main_mem:
-                            shm_dir = Path(f'/dev/shm/{shm_uid}/')
-                        else:
-                            shm_dir = Path(f'/tmp/{shm_uid}/')
-
-                        cmd = ''
-                        if bench_config.executable is not None:
-                            cmd += bench_config.executable
-                            cmd += ' '
-                        cmd += config
-
-                        shm_files = []
-                        for m in re.finditer(r"\$(file|folder){([^}]*)}", cmd):
-                            if m.group(1) == 'folder':
-                                folder = True
-                            else:
-                                folder = False
-                            path = m.group(2)
-                            
-                            if os.path.isabs(os.path.expanduser(path)):
-                                path = Path(path)
-                            else:
-                                if working_dir is not None:
-                                    path = os.path.realpath(os.path.expanduser(Path('~', working_dir, path)))
-                                    path = Path('~', os.path.relpath(path, start=starthome))
-                                else:
-                                    dir_name = os.path.realpath(os.path.join(bench_config_dir, path))
-                                    path = Path('~', os.path.relpath(dir_name, start=starthome))
-                            if folder:
-                                shm_path = Path(shm_dir, 'input')
-                                path = os.path.dirname(path)
-                                shm_files.append((f'-r {path}/*', shm_path))
+    try:
+        for instanceset_name, instancelist_filename, instancelist_dir, instances in instance_sets:
+            parsed_instances = None
+            duplicates = {}
+
+            for bench_config_name, benchmark_config in bench_config_dict.items():
+                if os.path.isabs(benchmark_config):
+                    config_path = benchmark_config
+                else:
+                    config_path = f'{bench_config_dir}/{benchmark_config}'
+
+                configs = read_list_file(config_path, True, 'config')
+
+                base_path = Path(bench_config.name)
+
+                if not isinstance(bench_config.configs, str):
+                    base_path = base_path / bench_config_name
+
+                if not isinstance(instance_conf, str):
+                    base_path = base_path / instanceset_name
+
+                if os.path.exists(base_path):
+                    if not bench_config.overwrite:
+                        print(f"Directory {os.path.realpath(base_path)} exists. Exiting...")
+                        exit(2)
+                else:
+                    os.makedirs(base_path)
+
+                if parsed_instances is None and len(configs) > 0:
+                    parsed_instances = [parse_instance(name, line, input_line, bench_config, instancelist_dir,
+                                                       working_dir, starthome, shm_dir, store)
+                                        for line, (name, input_line) in enumerate(instances.items(), start=1)
+                                        if not (input_line.startswith('#') or input_line.startswith('%'))]
+                    if catalog is not None:
+                        unique = {}
+                        for parsed_instance in parsed_instances:
+                            files = [resolve_path(e, instancelist_dir, working_dir)
+                                     for e in instance_files(parsed_instance.input_line)]
+                            catalog_instances[f'{instanceset_name}/{parsed_instance.name}'] = instance_demand(files, catalog)
+                            key = tuple(catalog[f]['sha256'] for f in files)
+                            if bench_config.deduplicate_instances and key in unique:
+                                duplicates[parsed_instance.name] = unique[key]
                             else:
-                                if str(path).startswith('~'):
-                                    path = path
-                                    shm_path = Path(shm_dir, 'input', os.path.basename(path))
-                                else:
-                                    path = Path('~', os.path.relpath(os.path.expanduser(path), start=starthome))
-                                    shm_path = Path(shm_dir, 'input', path)
-                                shm_files.append((path, shm_path))
-
-                        data_split = re.split('[;, ]', input_line)
-                        collected = {}
-                        uncompress = []
-                        cmd_instances = []
-                        for e in data_split:
-                            if bench_config.instances_are_parameters:
-                                cmd_instances.append(e)
+                                unique.setdefault(key, parsed_instance.name)
+                        if len(duplicates) > 0:
+                            print(f'...Skipping {len(duplicates)} instances of {instanceset_name} with the same '
+                                  f'content as another instance.')
+                            catalog_duplicates[instanceset_name] = duplicates
+                            parsed_instances = [p for p in parsed_instances if p.name not in duplicates]
+
+                metadata = {'instances': instances, 'configs': configs, 'timeout': bench_config.timeout,
+                            'slurm_time': slurm_time}
+                if store is not None:
+                    metadata['instance_store'] = {p.name: {e: {'path': v['path'], 'sha256': v['sha256']}
+                                                           for e, v in p.stored.items()}
+                                                  for p in parsed_instances or [] if len(p.stored) > 0}
+                if len(duplicates) > 0:
+                    metadata['duplicate_instances'] = duplicates
+                with open(base_path / 'metadata.json', 'w') as file:
+                    file.write(json.dumps(metadata, indent=4))
+
+                bench_path = os.path.relpath(base_path, start=starthome)
+                num_set_tasks = 0
+                table = TaskTable(base_path) if bench_config.manifest_mode else None
+                # (start list line, cost, config, instance, run) of every task if the start list is reordered
+                set_tasks = []
+                memoized = {}
+                with open(base_path / 'start_list.txt', 'w') as start_list:
+                    for config_line, (config_name, config) in enumerate(configs.items(), start=1):
+                        parsed_config = parse_config(config_name, config_line, config, bench_config, bench_config_dir,
+                                                     working_dir, starthome, shm_dir)
+
+                        for parsed_instance in parsed_instances:
+                            cmd, shm_files = build_command(parsed_config, parsed_instance, bench_config, config_path,
+                                                           instancelist_filename)
+                            shm_files += [(Path(bench_config.runsolver_path), runsolver_str)]
+                            pair_folder = Path(base_path, config_name, parsed_instance.name)
+                            log_folder = f'{bench_path}/{config_name}/{parsed_instance.name}/run{RUN_PLACEHOLDER}'
+                            cmd_dir = os.path.dirname(cmd.split(' ')[0])
+                            copy_cmds, uncompress_cmds = stage_commands(shm_files, parsed_instance.uncompress,
+                                                                        bench_config.stage_cache)
+                            if result_store is not None:
+                                pair_digest = result_store.pair_digest(cmd, shm_files)
+                            if table is not None:
+                                pair_text = manifest_row(log_folder, parsed_instance.input_line, cmd_dir,
+                                                         copy_cmds + uncompress_cmds, cmd,
+                                                         RESULT_ENTRY_PLACEHOLDER if result_store else None)
                             else:
-                                if e in collected.keys() and collected[e] != os.path.realpath(e):
-                                    print(
-                                        f'Instance {e} was already added. Instances of the same name from different paths are '
-                                        f'currently not supported! Exiting...')
-                                    exit(2)
-                                collected[e] = os.path.realpath(e)
-
-                                if os.path.isabs(os.path.expanduser(e)):
-                                    instance_path = Path(e)
+                                pair_text = start_template.render(**start_args, log_folder=f'~/{log_folder}',
+                                                                  bench_path=bench_path,
+                                                                  result_entry=RESULT_ENTRY_PLACEHOLDER,
+                                                                  task_index=TASK_PLACEHOLDER,
+                                                                  shm_uid=SHM_UID_PLACEHOLDER, shm_dir=shm_dir,
+                                                                  copy_cmds=copy_cmds,
+                                                                  uncompress_cmds=uncompress_cmds,
+                                                                  solver_cmd=cmd, runsolver_str=runsolver_str,
+                                                                  input_line=parsed_instance.input_line,
+                                                                  cmd_dir=cmd_dir)
+                                os.makedirs(pair_folder, exist_ok=True)
+
+                            if runtime_model is not None:
+                                cost = runtime_model.estimate(config, parsed_instance.input_line)
+                            elif ordered:
+                                cost = catalog_instances[f'{instanceset_name}/{parsed_instance.name}']['staged_bytes']
+                            for i in range(1, bench_config.runs + 1):
+                                # the seed is always drawn to keep the sequence of seeds independent of the config
+                                seed = str(random.randint(0, 2 ** 32))
+                                run_text = pair_text.replace(SEED_PLACEHOLDER, seed).replace(RUN_PLACEHOLDER, str(i))
+                                if result_store is not None:
+                                    fingerprint = result_store.run_fingerprint(
+                                        pair_digest, cmd.replace(SEED_PLACEHOLDER, seed), i)
+                                    previous = result_store.lookup(fingerprint)
+                                    run_folder = pair_folder / f'run{i}'
+                                    # never replace the results of a run of this benchmark
+                                    if previous is not None and (os.path.islink(run_folder) or
+                                                                 not os.path.exists(run_folder)):
+                                        os.makedirs(pair_folder, exist_ok=True)
+                                        if os.path.islink(run_folder):
+                                            os.unlink(run_folder)
+                                        os.symlink(previous, run_folder)
+                                        memoized[f'{config_name}/{parsed_instance.name}/run{i}'] = previous
+                                        continue
+                                    run_text = run_text.replace(RESULT_ENTRY_PLACEHOLDER,
+                                                                ResultStore.entry(fingerprint))
+                                num_set_tasks += 1
+                                num_tasks += 1
+
+                                if table is not None:
+                                    # the shm uid is only drawn by the runner at job start
+                                    table.write(run_text)
+                                    start_line = f'./runner.sh {num_set_tasks}\n'
+                                    job_path = f'{base_path / "runner.sh"} {num_set_tasks}'
                                 else:
-                                    if working_dir is not None:
-                                        instance_path = os.path.realpath(os.path.expanduser(Path('~', working_dir, e)))
-                                        instance_path = Path('~', os.path.relpath(instance_path, start=starthome))
-                                    else:
-                                        instance_dir = os.path.realpath(os.path.join(instancelist_dir, e))
-                                        instance_path = Path('~', os.path.relpath(instance_dir, start=starthome))
-
-                                shm_path = Path(shm_dir, 'input', os.path.basename(e))
-                                shm_files.append((Path(instance_path), shm_path))
-
-                                if e.lower().endswith('.lzma') or e.lower().endswith('.zip') or e.lower().endswith(
-                                        '.gz') or e.lower().endswith('.xz') or e.lower().endswith('.bz2'):
-                                    shm_path_uncompr = os.path.splitext(e)[0]
-                                    shm_path_uncompr = Path(shm_dir, 'input', os.path.basename(shm_path_uncompr))
-                                    uncompress.append((shm_path, shm_path_uncompr))
-                                    cmd_instances.append(shm_path_uncompr)
+                                    outputText = run_text.replace(SHM_UID_PLACEHOLDER, str(uuid.uuid1())).replace(
+                                        TASK_PLACEHOLDER, str(num_set_tasks))
+                                    job_path = pair_folder / f'run{i}' / 'start.sh'
+                                    writer.write(job_path, outputText)
+                                    start_line = f'{config_name}/{parsed_instance.name}/run{i}/start.sh\n'
+                                if ordered:
+                                    set_tasks.append((start_line, cost, config_name, parsed_instance.name, i))
                                 else:
-                                    shm_path_uncompr = shm_path
-                                    cmd_instances.append(shm_path_uncompr)
-
-                        cmd_instances_used = set()
-                        for m in re.finditer(r"\$[1-9][0-9]*", cmd):
-                            grp = m.group(0)
-                            idx = int(grp[1:])
-                            try:
-                                cmd = cmd.replace(grp, f'{cmd_instances[idx - 1]}')
-                            except IndexError as _:
-                                print(
-                                    f"Config: '{os.path.basename(config_path)}:L{config_line}' contained '${idx}', "
-                                    f"but instance '{instancelist_filename}:L{instance_config_line}' "
-                                    f"was missing an argument ${idx}.\n........Content was '{input_line}'.")
-                                print(f"Exiting!")
-                                exit(2)
-                            cmd_instances_used.add(idx - 1)
-
-                        for j, v in enumerate(cmd_instances):
-                            if j in cmd_instances_used:
-                                continue
-                            cmd += f' {v}'
-
-                        occ = {}
-                        for j, (p, sp) in enumerate(shm_files):
-                            if sp.name in occ:
-                                new_name = f'{sp.stem}{occ[sp.name]}{sp.suffix}'
-                                shm_files[j] = (p, sp.with_name(new_name))
-                                occ[sp.name] += 1
-                            else:
-                                occ[sp.name] = 1
-
-                        for _, f in shm_files:
-                            cmd = re.sub(r"\$file{([^}]*)}", str(f), cmd, 1)
-                            repl = ''
-                            for m in re.finditer(r"\$folder{([^}]*)}", cmd):
-                                repl = f"{str(f)}/{os.path.basename(m.group(1))}"
-                                break
-                            cmd = re.sub(r"\$folder{([^}]*)}", repl, cmd, 2)
-
-                        cmd = re.sub(r"\$timeout", str(bench_config.timeout * bench_config.timeout_factor), cmd)
-                        cmd = re.sub(r"\$seed", str(random.randint(0, 2 ** 32)), cmd)
-
-                        rs_file = Path(bench_config.runsolver_path).name
-                        runsolver_str = Path(shm_dir, 'input', rs_file)
-                        shm_files += [(Path(bench_config.runsolver_path), runsolver_str)]
-                        events_str = ','.join(PERF_EVENTS)
-                        log_folder = f'~/{os.path.relpath(log_folder, start=starthome)}'
-                        start_template = templateEnv.get_template('start.sh.jinja2')
-                        symlink_working_dir = working_dir is not None and bench_config.symlink_working_dir
-                        outputText = start_template.render(working_dir=working_dir,
-                                                           symlink_working_dir=symlink_working_dir,
-                                                           log_folder=log_folder, shm_uid=shm_uid, shm_dir=shm_dir,
-                                                           shm_files=shm_files,
-                                                           uncompress=uncompress,
-                                                           use_perf=bench_config.use_perf, perf_events=events_str,
-                                                           solver_cmd=cmd, runsolver_str=runsolver_str,
-                                                           perf_prefix=PERF_PREFIX,
-                                                           rs_time=rs_time, mem_limit=bench_config.mem_limit,
-                                                           runsolver_kill_delay=bench_config.runsolver_kill_delay,
-                                                           input_line=input_line, cmd_cwd=bench_config.cmd_cwd,
-                                                           cmd_dir=os.path.dirname(cmd.split(' ')[0]),
-                                                           starexec=bench_config.starexec_compatible,
-                                                           python_conda_env=bench_config.python_conda_env)
-                        num_tasks+=1
-                        if num_tasks > 1000 and warn_large_task_num:
-                            print(f'WARNING: you already generated {num_tasks} tasks!!!')
-                            if not query_yes_no('Do you want to proceed?', 'yes'):
-                                print('Exiting...')
-                                exit(4)
-                            warn_large_task_num = False
-
-
-                        with open(f"{job_path}", 'w') as fh:
-                            fh.write(outputText)
-
-                        st = os.stat(job_path)
-                        os.chmod(job_path, st.st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
-                        start_scripts += [job_path]
-
-            with open(base_path / 'metadata.json', 'w') as file:
-                file.write(json.dumps(metadata, indent=4))
-
-            with open(base_path / 'start_list.txt', 'w') as file:
-                for p in start_scripts:
-                    file.write(str(os.path.relpath(p, start=base_path)) + '\n')
-
-            bench_path = os.path.relpath(base_path, start=starthome)
-            slurm_template = templateEnv.get_template('batch_job.slurm.jinja2')
-            slurm_timeout = datetime.timedelta(seconds=slurm_time)
-            mem_per_cpu = int(math.ceil(bench_config.mem_limit / cpus))
-            min_freq = bench_config.cpu_freq * 1000
-            max_freq = bench_config.cpu_freq * 1000
-            output_path = 'slurm_logs'
-            os.makedirs(base_path / output_path, exist_ok=True)
-            outputText = slurm_template.render(benchmark_name=instanceset_name, slurm_timeout=slurm_timeout,
-                                               partition=bench_config.partition, cpus_per_task=cpus,
-                                               mem_per_cpu=mem_per_cpu, email=bench_config.email,
-                                               account=bench_config.billing,
-                                               cache_lines=cache_lines,
-                                               min_freq=min_freq, max_freq=max_freq,
-                                               write_scheduler_logs=bench_config.write_scheuler_logs,
-                                               output_path=output_path,
-                                               max_parallel_jobs=bench_config.max_parallel_jobs,
-                                               lstart_scripts=len(start_scripts), exclusive=bench_config.exclusive,
-                                               bench_path=bench_path)
-            with open(base_path / 'batch_job.slurm', 'w') as fh:
-                fh.write(outputText)
-
-            compress_results_slurm = templateEnv.get_template('compress_results.slurm.jinja2')
-            outputText = compress_results_slurm.render(benchmark_name=instanceset_name, partition=bench_config.partition,
-                                                       bench_path=bench_path,
-                                                       write_scheduler_logs=bench_config.write_scheuler_logs,
-                                                       output_path=output_path)
-            with open(base_path / 'compress_results.slurm', 'w') as fh:
-                fh.write(outputText)
-
-            submit_sh_path = Path(base_path, 'submit_all.sh')
-            submit_all = templateEnv.get_template('submit_all.sh.jinja2')
-            wd = os.path.relpath(base_path, start=starthome)
-            outputText = submit_all.render(wd=wd)
-            with open(submit_sh_path, 'w') as fh:
-                fh.write(outputText)
-
-
-            standalone_runner = templateEnv.get_template('standalone.py')
-            outputText = standalone_runner.render()
-            standalone_runner_path = f'{os.path.dirname(submit_sh_path)}/standalone.py'
-            with open(standalone_runner_path, 'w') as fh:
-                fh.write(outputText)
-
-            st = os.stat(submit_sh_path)
-            os.chmod(submit_sh_path, st.st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+                                    start_list.write(start_line)
+
+                    if ordered:
+                        order = task_order([t[1] for t in set_tasks], bench_config.task_order)
+                        if table is not None:
+                            # the runner looks up its row through the index, so only the index is reordered
+                            start_list.writelines(t[0] for t in set_tasks)
+                        else:
+                            start_list.writelines(set_tasks[i][0] for i in order)
+                        metadata['tasks'] = [list(set_tasks[i][2:]) for i in order]
+
+                if len(memoized) > 0:
+                    print(f'...Reusing {len(memoized)} finished runs from the result store.')
+                    metadata['memoized'] = memoized
+                if ordered or len(memoized) > 0:
+                    with open(base_path / 'metadata.json', 'w') as file:
+                        file.write(json.dumps(metadata, indent=4))
+
+                if table is not None:
+                    table.close(order if ordered else None)
+                    runner_path = base_path / 'runner.sh'
+                    outputText = start_template.render(**start_args, manifest=True, bench_path=bench_path,
+                                                       index_width=TaskTable.INDEX_WIDTH, shm_base=shm_dir.parent,
+                                                       log_folder='"$log_folder"', shm_uid='${shm_uid}',
+                                                       result_entry='$result_entry', task_index='$task_id',
+                                                       shm_dir='${shm_dir}',
+                                                       runsolver_str=Path('${shm_dir}', 'input', runsolver_str.name),
+                                                       input_line='$input_line', cmd_dir='"$cmd_dir"')
+                    with open(runner_path, 'w') as fh:
+                        fh.write(outputText)
+                        os.fchmod(fh.fileno(), writer.mode)
+
+                bench_path = os.path.relpath(base_path, start=starthome)
+                slurm_template = templateEnv.get_template('batch_job.slurm.jinja2')
+                tasks_per_element = array_element_tasks(bench_config, slurm_time)
+                slurm_timeout = datetime.timedelta(seconds=slurm_time * tasks_per_element)
+                mem_per_cpu = int(math.ceil(bench_config.mem_limit / cpus))
+                min_freq = bench_config.cpu_freq * 1000
+                max_freq = bench_config.cpu_freq * 1000
+                output_path = 'slurm_logs'
+                os.makedirs(base_path / output_path, exist_ok=True)
+                outputText = slurm_template.render(benchmark_name=instanceset_name, slurm_timeout=slurm_timeout,
+                                                   partition=bench_config.partition, cpus_per_task=cpus,
+                                                   mem_per_cpu=mem_per_cpu, email=bench_config.email,
+                                                   account=bench_config.billing,
+                                                   cache_lines=cache_lines,
+                                                   min_freq=min_freq, max_freq=max_freq,
+                                                   write_scheduler_logs=bench_config.write_scheuler_logs,
+                                                   output_path=output_path,
+                                                   max_parallel_jobs=bench_config.max_parallel_jobs,
+                                                   lstart_scripts=math.ceil(num_set_tasks / tasks_per_element),
+                                                   tasks_per_element=tasks_per_element, num_tasks=num_set_tasks,
+                                                   exclusive=bench_config.exclusive,
+                                                   bench_path=bench_path, manifest=bench_config.manifest_mode)
+                if bench_config.whole_node:
+                    outputText = render_whole_node(templateEnv, bench_config, cpus, slurm_time, num_set_tasks,
+                                                   benchmark_name=instanceset_name, email=bench_config.email,
+                                                   account=bench_config.billing, min_freq=min_freq, max_freq=max_freq,
+                                                   write_scheduler_logs=bench_config.write_scheuler_logs,
+                                                   output_path=output_path, bench_path=bench_path,
+                                                   manifest=bench_config.manifest_mode)
+                with open(base_path / 'batch_job.slurm', 'w') as fh:
+                    fh.write(outputText)
+
+                compress_results_slurm = templateEnv.get_template('compress_results.slurm.jinja2')
+                outputText = compress_results_slurm.render(benchmark_name=instanceset_name,
+                                                           partition=bench_config.partition,
+                                                           bench_path=bench_path, bench_dir=base_path.name,
+                                                           write_scheduler_logs=bench_config.write_scheuler_logs,
+                                                           output_path=output_path,
+                                                           archive_codec=bench_config.archive_codec,
+                                                           archive_cpus=bench_config.archive_cpus,
+                                                           archive_shards=ARCHIVE_SHARDS.get(
+                                                               bench_config.archive_shards),
+                                                           incremental_archive=bench_config.incremental_archive,
+                                                           archive_ext=archive_ext,
+                                                           dereference=result_store is not None)
+                with open(base_path / 'compress_results.slurm', 'w') as fh:
+                    fh.write(outputText)
+
+                submit_sh_path = Path(base_path, 'submit_all.sh')
+                submit_all = templateEnv.get_template('submit_all.sh.jinja2')
+                wd = os.path.relpath(base_path, start=starthome)
+                outputText = submit_all.render(wd=wd)
+                with open(submit_sh_path, 'w') as fh:
+                    fh.write(outputText)
+
+                standalone_runner = templateEnv.get_template('standalone.py')
+                outputText = standalone_runner.render(cpus_per_task=cpus, mem_lines=bench_config.mem_lines,
+                                                      index_width=TaskTable.INDEX_WIDTH)
+                standalone_runner_path = f'{os.path.dirname(submit_sh_path)}/standalone.py'
+                with open(standalone_runner_path, 'w') as fh:
+                    fh.write(outputText)
+
+                if bench_config.sample_interval is not None:
+                    sampler = templateEnv.get_template('sampler.py')
+                    outputText = sampler.render(sample_interval=bench_config.sample_interval,
+                                                sample_events=bench_config.sample_events or [])
+                    with open(base_path / 'sampler.py', 'w') as fh:
+                        fh.write(outputText)
+
+                st = os.stat(submit_sh_path)
+                os.chmod(submit_sh_path, st.st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+    finally:
+        writer.close()
+
+    if catalog is not None and os.path.isdir(bench_config.name):
+        write_catalog(catalog_file, catalog, catalog_instances, catalog_duplicates)
+        shm_demand = [d['shm_bytes'] for d in catalog_instances.values() if d['shm_bytes'] is not None]
+        if len(shm_demand) > 0:
+            print(f'...Largest /dev/shm demand of an instance: {max(shm_demand) / 2 ** 20:.1f} MiB '
+                  f'(all instances: {sum(d["staged_bytes"] for d in catalog_instances.values()) / 2 ** 30:.2f} GiB '
+                  f'staged per config and run).')
+            if bench_config.data_to_main_mem and max(shm_demand) > bench_config.mem_limit * 2 ** 20:
+                print(f'Warning: instances in /dev/shm may exceed the memory limit of {bench_config.mem_limit} MB.')
+
+    return num_tasks, job_path
+
+
+SUBCOMMANDS = {
+    'race': 'racing',
+    'status': 'status',
+    'retry': 'retry',
+}
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        module = importlib.import_module(f'.{SUBCOMMANDS[sys.argv[1]]}', __package__)
+        module.main(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description=f'copperbench (version {__version__})')
+    parser.add_argument('bench_config_file')
+    parser.add_argument('--estimate', action='store_true',
+                        help='only print the number of tasks and the estimated cost without generating any files')
+    parser.add_argument('--nodes', type=int, default=None,
+                        help='number of nodes of the partition used to estimate the makespan')
+    args = parser.parse_args()
+
+    bench_config_dir = os.path.dirname(os.path.realpath(args.bench_config_file))
+    with open(os.path.realpath(args.bench_config_file)) as fh:
+        bench_config = BenchConfig(**json.loads(fh.read()))
+
+    if args.estimate:
+        print_estimate(estimate(bench_config, bench_config_dir, args.nodes))
+        return
+    # the estimate stats every instance file, so it is only computed for large benchmarks
+    if bench_config.warn_large_task_num and count_tasks(bench_config, bench_config_dir) > 1000:
+        print_estimate(estimate(bench_config, bench_config_dir, args.nodes))
+        if not query_yes_no('Do you want to generate the benchmark?', 'yes'):
+            print('Exiting...')
+            exit(4)
+
+    num_tasks, job_path = generate(bench_config, bench_config_dir)
+
     if job_path is None or job_path == '':
         job_path = 'NO_FILE_GENERATED'
     print(f'Copperbench generated in total {num_tasks} task files.')
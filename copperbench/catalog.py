@@ -0,0 +1,118 @@
+#!/usr/bin/false
+import gzip
+import hashlib
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterable, Optional, List
+
+from .instance_store import MAGIC_BZ2, MAGIC_GZIP, MAGIC_XZ, MAGIC_LZMA, MAGIC_ZIP
+
+CATALOG_FILE = 'instance_catalog.json'
+CHUNK_SIZE = 1 << 20
+
+
+def compression_type(path: str) -> Optional[str]:
+    with open(path, 'rb') as fh:
+        magic = fh.read(6)
+    for name, m in [('bz2', MAGIC_BZ2), ('gzip', MAGIC_GZIP), ('xz', MAGIC_XZ), ('lzma', MAGIC_LZMA),
+                    ('zip', MAGIC_ZIP)]:
+        if magic.startswith(m):
+            return name
+    return None
+
+
+def uncompressed_size(path: str, compression: Optional[str], size: int) -> Optional[int]:
+    """
+    Size of the decompressed content if it can be determined cheaply (uncompressed, gzip < 4 GiB and zip).
+    """
+    if compression is None:
+        return size
+    if compression == 'gzip' and size >= 18:
+        with open(path, 'rb') as fh:
+            fh.seek(-4, os.SEEK_END)
+            return struct.unpack('<I', fh.read(4))[0]
+    if compression == 'zip':
+        import zipfile
+        with zipfile.ZipFile(path) as archive:
+            return archive.infolist()[0].file_size
+    return None
+
+
+def catalog_entry(path: str) -> Dict[str, Any]:
+    st = os.stat(path)
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        while True:
+            chunk = fh.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            checksum.update(chunk)
+    compression = compression_type(path)
+    return {'size': st.st_size, 'mtime': st.st_mtime, 'sha256': checksum.hexdigest(), 'compression': compression,
+            'uncompressed_size': uncompressed_size(path, compression, st.st_size)}
+
+
+def read_catalog(catalog_file: Path) -> Dict[str, Dict[str, Any]]:
+    if not os.path.exists(catalog_file):
+        return {}
+    with open(catalog_file) as fh:
+        return json.loads(fh.read())['files']
+
+
+def build_catalog(paths: Iterable[str], previous: Optional[Dict[str, Dict[str, Any]]] = None,
+                  workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Stats and hashes every distinct (resolved) instance file in parallel. Entries of a previous catalog are
+    reused if the size and mtime of the file did not change.
+    """
+    previous = previous or {}
+    catalog = {}
+    todo = []
+    for path in sorted(set(paths)):
+        entry = previous.get(path)
+        if entry is not None:
+            try:
+                st = os.stat(path)
+                if entry['size'] == st.st_size and entry['mtime'] == st.st_mtime:
+                    catalog[path] = entry
+                    continue
+            except FileNotFoundError:
+                pass
+        todo.append(path)
+
+    if len(todo) > 0:
+        print(f'...Cataloging {len(todo)} instance files ({len(catalog)} unchanged).')
+        # hashing releases the GIL and stat is I/O bound, so threads suffice
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for path, entry in zip(todo, executor.map(catalog_entry, todo)):
+                catalog[path] = entry
+    return catalog
+
+
+def instance_demand(files: List[str], catalog: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Bytes copied to the node and the /dev/shm demand (copied plus decompressed files, None if unknown) of an instance.
+    """
+    staged = sum(catalog[f]['size'] for f in files)
+    shm = staged
+    for f in files:
+        if catalog[f]['compression'] is not None:
+            if catalog[f]['uncompressed_size'] is None:
+                shm = None
+                break
+            shm += catalog[f]['uncompressed_size']
+    return {'files': files, 'staged_bytes': staged, 'shm_bytes': shm}
+
+
+def write_catalog(catalog_file: Path, catalog: Dict[str, Dict[str, Any]],
+                  instances: Dict[str, Dict[str, Any]], duplicates: Dict[str, str]) -> None:
+    by_hash = {}
+    for path, entry in catalog.items():
+        by_hash.setdefault(entry['sha256'], []).append(path)
+    with open(catalog_file, 'w') as fh:
+        fh.write(json.dumps({'files': catalog, 'instances': instances, 'duplicate_instances': duplicates,
+                             'identical_files': [paths for paths in by_hash.values() if len(paths) > 1]},
+                            indent=4))
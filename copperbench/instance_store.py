@@ -0,0 +1,139 @@
+#!/usr/bin/false
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, Optional, BinaryIO
+
+MAGIC_BZ2 = b'BZh'
+MAGIC_GZIP = b'\x1f\x8b'
+MAGIC_XZ = b'\xfd7zXZ\x00'
+MAGIC_LZMA = b'\x5d\x00\x00'
+MAGIC_ZIP = b'PK\x03\x04'
+
+CODEC_SUFFIXES = {'zstd': '.zst', 'lz4': '.lz4'}
+CHUNK_SIZE = 1 << 20
+
+
+def check_codec(codec: Optional[str]) -> None:
+    if codec is None:
+        return
+    if codec not in CODEC_SUFFIXES:
+        raise ValueError(f'Unknown instance store codec "{codec}" (supported: {", ".join(CODEC_SUFFIXES)}).')
+    try:
+        if codec == 'zstd':
+            import zstandard
+        else:
+            import lz4.frame
+    except ImportError:
+        raise ImportError(f'The instance store codec "{codec}" requires the python module '
+                          f'"{"zstandard" if codec == "zstd" else "lz4"}".')
+
+
+@contextmanager
+def _open_decompressed(path: str) -> Iterator[BinaryIO]:
+    # detect the format by its magic bytes like "file --mime-type" does in the start script
+    with open(path, 'rb') as fh:
+        magic = fh.read(6)
+    if magic.startswith(MAGIC_BZ2):
+        import bz2
+        with bz2.open(path, 'rb') as fh:
+            yield fh
+    elif magic.startswith(MAGIC_GZIP):
+        import gzip
+        with gzip.open(path, 'rb') as fh:
+            yield fh
+    elif magic.startswith(MAGIC_XZ) or magic.startswith(MAGIC_LZMA):
+        import lzma
+        with lzma.open(path, 'rb') as fh:
+            yield fh
+    elif magic.startswith(MAGIC_ZIP):
+        import zipfile
+        with zipfile.ZipFile(path) as archive, archive.open(archive.namelist()[0]) as fh:
+            yield fh
+    else:
+        with open(path, 'rb') as fh:
+            yield fh
+
+
+def _open_store_file(path: str, codec: Optional[str]) -> BinaryIO:
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(open(path, 'wb'))
+    elif codec == 'lz4':
+        import lz4.frame
+        return lz4.frame.open(path, 'wb')
+    return open(path, 'wb')
+
+
+def decompress_instance(src: str, dst: str, codec: Optional[str]) -> str:
+    """
+    Decompresses src into dst (optionally recompressed with codec) and returns the sha256 of the decompressed data.
+    """
+    checksum = hashlib.sha256()
+    tmp = f'{dst}.tmp{os.getpid()}'
+    with _open_decompressed(src) as fin, _open_store_file(tmp, codec) as fout:
+        while True:
+            chunk = fin.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            checksum.update(chunk)
+            fout.write(chunk)
+    os.replace(tmp, dst)
+    return checksum.hexdigest()
+
+
+def store_name(src: str, codec: Optional[str]) -> str:
+    """
+    Name of the stored file, i.e. the basename without the compression suffix (as the start script names it).
+    """
+    name = os.path.basename(os.path.splitext(src)[0])
+    if codec is not None:
+        name += CODEC_SUFFIXES[codec]
+    return name
+
+
+def build_instance_store(sources: Iterable[str], store_dir: Path, codec: Optional[str] = None,
+                         workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Decompresses every distinct source file once (in parallel) into store_dir and returns for each source
+    the stored file, its codec and the sha256 of the decompressed content.
+    Entries of a previous build are reused if the size and mtime of the source did not change.
+    """
+    check_codec(codec)
+    store_dir = Path(store_dir)
+    os.makedirs(store_dir, exist_ok=True)
+    index_path = store_dir / 'index.json'
+    index = {}
+    if index_path.exists():
+        with open(index_path) as fh:
+            index = json.loads(fh.read())
+
+    store = {}
+    todo = {}
+    for src in sorted(set(sources)):
+        st = os.stat(src)
+        entry = index.get(src)
+        if (entry is not None and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime and
+                entry['codec'] == codec and os.path.exists(entry['path'])):
+            store[src] = entry
+            continue
+        digest = hashlib.sha1(src.encode()).hexdigest()[:16]
+        os.makedirs(store_dir / digest, exist_ok=True)
+        dst = os.path.realpath(store_dir / digest / store_name(src, codec))
+        store[src] = {'path': dst, 'codec': codec, 'size': st.st_size, 'mtime': st.st_mtime}
+        todo[src] = dst
+
+    if len(todo) > 0:
+        print(f'...Decompressing {len(todo)} instances into {os.path.realpath(store_dir)}.')
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {src: executor.submit(decompress_instance, src, dst, codec) for src, dst in todo.items()}
+            for src, future in futures.items():
+                store[src]['sha256'] = future.result()
+
+    index.update(store)
+    with open(index_path, 'w') as fh:
+        fh.write(json.dumps(index, indent=4))
+    return store
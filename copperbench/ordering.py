@@ -0,0 +1,79 @@
+#!/usr/bin/false
+import json
+import os
+import statistics
+from pathlib import Path
+from typing import List, Union
+
+from .parsers import parse_varfile
+
+TASK_ORDERS = ['nested', 'longest_first', 'interleave']
+
+
+class RuntimeModel:
+    """
+    Expected runtime of a config/instance pair taken from the runs of a previous benchmark. Pairs and instances are
+    matched by the config line and the instance line, falling back to the mean of the instance over all configs and
+    finally to the median of all pairs.
+    """
+
+    def __init__(self, bench_folder: Union[Path, str]):
+        pairs = {}
+        # metadata.json is only in the benchmark folder (or in the folder of each instance set directly below it),
+        # the run folders are never walked to find it
+        bench_folders = [Path(bench_folder)] + [Path(d.path) for d in os.scandir(bench_folder)
+                                                if d.is_dir() and not d.name.startswith('config')]
+        for folder in bench_folders:
+            if not (folder / 'metadata.json').exists():
+                continue
+            with open(folder / 'metadata.json') as fh:
+                metadata = json.loads(fh.read())
+            for config_dir in os.scandir(folder):
+                if not (config_dir.name.startswith('config') and config_dir.name in metadata['configs']):
+                    continue
+                for instance_dir in os.scandir(config_dir):
+                    if instance_dir.name not in metadata['instances']:
+                        continue
+                    key = (metadata['configs'][config_dir.name], metadata['instances'][instance_dir.name])
+                    for run_dir in os.scandir(instance_dir):
+                        varfile = Path(run_dir.path, 'varfile.log')
+                        if run_dir.name.startswith('run') and varfile.exists():
+                            wctime = parse_varfile(varfile).get('varfile_wctime')
+                            if isinstance(wctime, (int, float)):
+                                pairs.setdefault(key, []).append(wctime)
+        self.pairs = {k: statistics.mean(v) for k, v in pairs.items()}
+        instances = {}
+        for (_, instance), t in self.pairs.items():
+            instances.setdefault(instance, []).append(t)
+        self.instances = {k: statistics.mean(v) for k, v in instances.items()}
+        self.default = statistics.median(self.pairs.values()) if len(self.pairs) > 0 else 0.0
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    def estimate(self, config_line: str, input_line: str) -> float:
+        t = self.pairs.get((config_line, input_line))
+        if t is None:
+            t = self.instances.get(input_line, self.default)
+        return t
+
+
+def task_order(costs: List[float], order: str) -> List[int]:
+    """
+    Permutation of the tasks (indices into costs) for the start list. longest_first sorts by decreasing cost,
+    interleave alternates between the most and the least expensive remaining task. Ties keep the nested order.
+    """
+    if order == 'nested':
+        return list(range(len(costs)))
+    ordered = sorted(range(len(costs)), key=lambda i: -costs[i])
+    if order == 'longest_first':
+        return ordered
+    result = []
+    lo, hi = 0, len(ordered) - 1
+    while lo <= hi:
+        result.append(ordered[lo])
+        if lo != hi:
+            result.append(ordered[hi])
+        lo += 1
+        hi -= 1
+    return result
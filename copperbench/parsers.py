@@ -0,0 +1,178 @@
+#!/usr/bin/false
+import mmap
+import os
+import re
+from pathlib import Path
+from re import Pattern
+from typing import Dict, Any, Optional, Union
+
+TAIL_SIZE = 1 << 16
+
+REGEX_RUNSOLVER = {
+    'runsolver_wall_time': re.compile(r'^Real time \(s\): (?P<v>[\d.]+)$', re.M),
+    'runsolver_cpu_time': re.compile(r'^CPU time \(s\): (?P<v>[\d.]+)$', re.M),
+    'runsolver_user_time': re.compile(r'^CPU user time \(s\): (?P<v>[\d.]+)$', re.M),
+    'runsolver_system_time': re.compile(r'^CPU system time \(s\): (?P<v>[\d.]+)$', re.M),
+    'runsolver_max_virt_mem_kb': re.compile(r'^Max\. virtual memory \(cumulated for all children\) \(KiB\): (?P<v>\d+)$', re.M),
+    'runsolver_max_mem_kb': re.compile(r'^Max\. memory \(cumulated for all children\) \(KiB\): (?P<v>\d+)$', re.M),
+    'runsolver_exit_status': re.compile(r'^Child status: (?P<v>-?\d+)$', re.M),
+    'runsolver_signal': re.compile(r'^Child ended because it received signal (?P<v>\d+)', re.M),
+}
+REGEX_RUNSOLVER_LIMIT = re.compile(r'^Maximum (?P<limit>wall clock time|CPU time|memory|VSize) exceeded', re.M)
+REGEX_VARFILE = re.compile(r'^(?P<key>[A-Z_]+)=(?P<value>.*)$', re.M)
+REGEX_TIMING = re.compile(r'^(?P<phase>Stage|Run|Cleanup) time \(ms\): (?P<value>\d+)$', re.M)
+REGEX_NODE_INFO = re.compile(r'^(?P<key>Date|Node|Cpus_allowed):\s+(?P<value>.+)$', re.M)
+NODE_INFO_KEYS = {'Date': 'slurm_date', 'Node': 'slurm_node', 'Cpus_allowed': 'slurm_cpumask'}
+REGEX_PERF_TIME = re.compile(r'^(?P<value>[\d.,]+) seconds (?P<name>time elapsed|user|sys)$')
+REGEX_PERF_EVENT = re.compile(r"^(?P<value><not counted>|<not supported>|[\d.,'\u00a0\u202f]*\d)\s+"
+                              r"(?:(?P<unit>msec|usec|nsec|sec)\s+)?(?P<event>[^\s#]+)")
+
+
+def read_tail(log_file: Union[Path, str], size: Optional[int] = TAIL_SIZE) -> str:
+    """
+    The last size bytes (or everything if size is None) of a log, read through a memory map such that
+    only the tail of large logs is paged in.
+    """
+    with open(log_file, 'rb') as fh:
+        length = os.fstat(fh.fileno()).st_size
+        if length == 0:
+            return ''
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0 if size is None else max(0, length - size)
+            return mm[start:].decode(errors='replace')
+
+
+def search_tail(log_file: Union[Path, str], regex: Pattern, size: int = TAIL_SIZE):
+    """
+    Last match of regex in the log, searching a tail of increasing size (matches are not allowed to
+    start within the first line of the tail as it may be cut).
+    """
+    length = os.path.getsize(log_file)
+    while True:
+        text = read_tail(log_file, size)
+        cut = 0 if size >= length else text.find('\n') + 1
+        match = None
+        for match in regex.finditer(text, cut):
+            pass
+        if match is not None or size >= length:
+            return match
+        size *= 4
+
+
+class TailRegexReader:
+    """
+    Log reader returning the named groups of the last match of a regex, e.g. the last reported cost of an
+    optimization, which scans only the tail of the log instead of matching (?s:.*) against the whole log.
+    """
+
+    def __init__(self, regex: Pattern, size: int = TAIL_SIZE):
+        self.regex = regex
+        self.size = size
+
+    def __call__(self, log_file: Path) -> Optional[Dict[str, Any]]:
+        match = search_tail(log_file, self.regex, self.size)
+        if match != None:
+            return match.groupdict()
+
+    def fingerprint(self) -> str:
+        return f'TailRegexReader:{self.regex.flags}:{self.regex.pattern}'
+
+
+def _typed(value: str) -> Any:
+    value = value.strip()
+    if value in ('true', 'false'):
+        return value == 'true'
+    for t in (int, float):
+        try:
+            return t(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_runsolver(log_file: Union[Path, str]) -> Dict[str, Any]:
+    text = read_tail(log_file)
+    entry = {}
+    for key, regex in REGEX_RUNSOLVER.items():
+        match = None
+        for match in regex.finditer(text):
+            pass
+        if match is not None:
+            entry[key] = _typed(match.group('v'))
+    limit = REGEX_RUNSOLVER_LIMIT.search(text)
+    if limit is not None:
+        entry['runsolver_limit'] = limit.group('limit')
+    return entry
+
+
+def parse_varfile(log_file: Union[Path, str]) -> Dict[str, Any]:
+    # e.g. WCTIME, CPUTIME, USERTIME, SYSTEMTIME, CPUUSAGE, MAXVM, TIMEOUT, MEMOUT
+    return {f'varfile_{m.group("key").lower()}': _typed(m.group('value'))
+            for m in REGEX_VARFILE.finditer(read_tail(log_file))}
+
+
+def parse_cgroup(log_file: Union[Path, str]) -> Dict[str, Any]:
+    # counters of the solver cgroup written by the cgroup resource backend
+    return {f'cgroup_{m.group("key").lower()}': _typed(m.group('value'))
+            for m in REGEX_VARFILE.finditer(read_tail(log_file))}
+
+
+def parse_timing(log_file: Union[Path, str]) -> Dict[str, Any]:
+    # phase times written by the lean runner
+    return {f'timing_{m.group("phase").lower()}_ms': int(m.group('value'))
+            for m in REGEX_TIMING.finditer(read_tail(log_file))}
+
+
+def parse_node_info(log_file: Union[Path, str]) -> Dict[str, Any]:
+    return {NODE_INFO_KEYS[m.group('key')]: m.group('value').strip()
+            for m in REGEX_NODE_INFO.finditer(read_tail(log_file, None))}
+
+
+def parse_perf_number(value: str, integer: bool) -> Union[int, float]:
+    """
+    Parses a number printed by perf in any locale, e.g. 1,234,567 or 1.234.567 or 1'234'567 and 1.5 or 1,5.
+    """
+    value = value.replace('\u00a0', '').replace('\u202f', '').replace("'", '')
+    if integer:
+        return int(value.replace('.', '').replace(',', ''))
+    seps = [c for c in value if c in '.,']
+    if len(seps) == 0:
+        return float(value)
+    # the decimal separator is the last separator unless it is repeated (then it separates thousands)
+    decimal = seps[-1]
+    if seps.count(decimal) > 1:
+        return float(value.replace(decimal, ''))
+    thousands = ',' if decimal == '.' else '.'
+    return float(value.replace(thousands, '').replace(decimal, '.'))
+
+
+def parse_perf(log_file: Union[Path, str]) -> Dict[str, Any]:
+    """
+    Parses the output of perf stat, both the human readable format (in any locale) and the CSV format (-x).
+    """
+    entry = {}
+    for line in read_tail(log_file, None).splitlines():
+        line = line.strip()
+        if len(line) == 0 or line.startswith('#') or line.startswith('Performance counter stats'):
+            continue
+        match = REGEX_PERF_TIME.match(line)
+        if match is not None:
+            entry[f'perf_seconds-{match.group("name").replace(" ", "-")}'] = parse_perf_number(match.group('value'), False)
+            continue
+        fields = re.split(r'[,;]', line)
+        if len(fields) >= 3 and re.search(r'\s', re.sub(r'<not (counted|supported)>', '', line)) is None:
+            # CSV format: value, unit, event, ...
+            value, unit, event = fields[0], fields[1], fields[2]
+            if value.startswith('<'):
+                entry[f'perf_{event}'] = None
+            else:
+                entry[f'perf_{event}'] = _typed(value)
+            continue
+        match = REGEX_PERF_EVENT.match(line)
+        if match is not None:
+            value = match.group('value')
+            if value.startswith('<'):
+                entry[f'perf_{match.group("event")}'] = None
+            else:
+                entry[f'perf_{match.group("event")}'] = parse_perf_number(value, match.group('unit') is None)
+    return entry
@@ -1,89 +1,625 @@
-from typing import Dict, List, Any, Optional, Callable, Union
+from typing import Dict, List, Any, Optional, Callable, Union, Tuple, Iterable, Iterator
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from re import Pattern
 from pathlib import Path
+import gzip
+import hashlib
 import json
 import os
+import pickle
 import re
+import shutil
+import sqlite3
+import subprocess
+import tarfile
+import tempfile
 
+from . import parsers
 
-def process_bench(bench_folder: Union[Path, str], log_read_func: Callable[[Path], Optional[Dict[str, Any]]],
-                  metadata_file: Optional[Union[Path, str]] = None, include_metrics: bool = False,
-                  err_read_func: Callable[[Path], Optional[Dict[str, Any]]] = lambda x: None) -> List[Dict[str, Any]]:
-    bench_folder = Path(bench_folder)
-    if metadata_file != None:
-        metadata_file = Path(metadata_file)
-        with open(metadata_file, 'r') as file:
-            metadata = json.loads(file.read())
-    else:
-        metadata = None
+REGEX_NATURAL = re.compile(r'(\d+)')
+# bump whenever read_metrics changes to invalidate cached records with metrics
+METRICS_VERSION = 4
+CACHE_FILE = 'postprocess_cache.sqlite'
+LOG_FILES = ['stdout.log', 'stderr.log']
+METRICS_FILES = ['node_info.log', 'runsolver.log', 'varfile.log', 'perf.log', 'timing.log', 'cgroup.log']
+MAGIC_ZSTD = b'\x28\xb5\x2f\xfd'
+# extensions of stdout and stderr written through log_codec
+LOG_EXTENSIONS = ['.gz', '.zst']
 
-    regex_slurm = re.compile(r"Date:\s+(?P<slurm_date>.+)\nNode:\s+(?P<slurm_node>.+)\nCpus_allowed:\s+(?P<slurm_cpumask>.+)")
-    regex_runsolver = re.compile(r"(?s:.*)Max\. virtual memory \(cumulated for all children\) \(KiB\): (?P<runsolver_max_virt_mem_kb>\d+)\nMax\. memory \(cumulated for all children\) \(KiB\): (?P<runsolver_max_mem_kb>\d+)")
 
-    data = []
-    for config_dir in os.scandir(bench_folder):
-        if config_dir.name.startswith('config') and os.path.isdir(config_dir):
-            for instance_dir in os.scandir(config_dir):
-                if instance_dir.name.startswith('instance') and os.path.isdir(instance_dir):
-                    for run_dir in os.scandir(instance_dir):
-                        if run_dir.name.startswith('run') and os.path.isdir(run_dir):
-                            result_log = log_read_func(Path(run_dir, 'stdout.log'))
-                            result_err = err_read_func(Path(run_dir, 'stderr.log'))
-                            result = {}
-                            if result_log:
-                                result = result | result_log
-                            if result_err:
-                                result = result | result_err
-                            if result:
-                                if metadata != None:
-                                    conf_name = metadata['configs'][config_dir.name]
-                                    inst_name = metadata['instances'][instance_dir.name]
-                                else:
-                                    conf_name = config_dir.name
-                                    inst_name = instance_dir.name
-                                entry = {}
-                                entry['config'] = conf_name
-                                entry['instance'] = inst_name
-                                entry['run'] = run_dir.name[3:]
-                                if include_metrics:
-                                    with open(Path(run_dir, 'node_info.log'), 'r') as file:
-                                        match = regex_slurm.match(file.read())
-                                        if match != None:
-                                            entry = entry | match.groupdict()
-                                    with open(Path(run_dir, 'runsolver.log'), 'r') as file:
-                                        match = regex_runsolver.match(file.read())
-                                        if match != None:
-                                            entry = entry | match.groupdict()
-                                    perf_log = Path(run_dir, 'perf.log')
-                                    if perf_log.exists():
-                                        with open(perf_log, 'r') as file:
-                                            lines = [ l.strip() for l in file.readlines() ]
-                                            lines = [ l for l in lines if len(l) > 0 ]
-                                            events = lines[2:-3]
-                                            times = lines[-3:]
-                                            for event in events:
-                                                split = [ e for e in event.split(' ') if len(e) > 0 ]
-                                                value = int(split[0].replace(".", ""))
-                                                variable = split[1]
-                                                entry[f'perf_{variable}'] = value
-                                            for time in times:
-                                                t = time.split(' ')
-                                                value = float(t[0].replace(".", "").replace(",", "."))
-                                                variable = '-'.join(t[1:])
-                                                entry[f'perf_{variable}'] = value
-                                        
-                                data += [entry | result]
-
-    return data
+def natural_key(name: str) -> List[Union[int, str]]:
+    # sorts config2 before config10
+    return [int(s) if s.isdigit() else s for s in REGEX_NATURAL.split(name)]
 
 
-def process_bench_regex(bench_folder: Union[Path, str], regex: Pattern,
-                        metadata_file: Optional[Union[Path, str]] = None, include_metrics: bool = False) -> List[Dict[str, Any]]:
+def no_log(log_file: Path) -> Optional[Dict[str, Any]]:
+    return None
+
+
+def _code_digest(code, checksum, names: List[str]) -> None:
+    # nested code objects (lambdas, comprehensions) are hashed instead of their repr, which contains their address
+    checksum.update(code.co_code)
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            _code_digest(const, checksum, names)
+        else:
+            checksum.update(repr(const).encode())
+    names.extend(code.co_names)
+
+
+def _value_digest(value: Any, checksum, seen: set) -> None:
+    # the values a reader depends on besides its code, e.g. a module level regex
+    if isinstance(value, Pattern):
+        checksum.update(f'{value.pattern!r}:{value.flags}'.encode())
+    elif isinstance(value, (str, bytes, int, float, bool, type(None), tuple, list, dict, set, frozenset)):
+        checksum.update(repr(value).encode())
+    elif hasattr(value, '__code__') and id(value) not in seen:
+        seen.add(id(value))
+        _func_digest(value, checksum, seen)
+    elif hasattr(value, 'fingerprint'):
+        checksum.update(value.fingerprint().encode())
+
+
+def _func_digest(func: Callable, checksum, seen: set) -> None:
+    names = []
+    _code_digest(func.__code__, checksum, names)
+    func_globals = getattr(func, '__globals__', {})
+    for name in names:
+        if name in func_globals:
+            checksum.update(name.encode())
+            _value_digest(func_globals[name], checksum, seen)
+    for cell in getattr(func, '__closure__', None) or ():
+        try:
+            _value_digest(cell.cell_contents, checksum, seen)
+        except ValueError:
+            # empty cell
+            pass
+
+
+def parser_fingerprint(func: Callable[[Path], Optional[Dict[str, Any]]]) -> str:
+    """
+    Identifies a log reader by its name, its bytecode and the globals (e.g. compiled regexes), functions and closure
+    cells it uses, or by its own fingerprint() method.
+    """
+    if hasattr(func, 'fingerprint'):
+        return func.fingerprint()
+    name = f'{getattr(func, "__module__", "")}.{getattr(func, "__qualname__", type(func).__qualname__)}'
+    if getattr(func, '__code__', None) is None:
+        return name
+    checksum = hashlib.sha1()
+    _func_digest(func, checksum, {id(func)})
+    return f'{name}:{checksum.hexdigest()}'
+
+
+class ParseCache:
+    """
+    SQLite cache of parsed runs, keyed by the run folder, the size and mtime of its logs and a fingerprint of the
+    parsers. Lookups are done by the (worker) processes parsing an instance folder, stores only by the main process.
+    """
+
+    def __init__(self, cache_file: Union[Path, str], fingerprint: str):
+        self.cache_file = str(cache_file)
+        self.fingerprint = fingerprint
+        self.conn = sqlite3.connect(self.cache_file, timeout=60)
+
+    def create(self) -> None:
+        with self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS runs (fingerprint TEXT, instance_dir TEXT, run TEXT, '
+                              'stamp TEXT, record BLOB, PRIMARY KEY (fingerprint, instance_dir, run))')
+
+    def lookup(self, instance_dir: str) -> Dict[str, Tuple[str, Optional[Dict[str, Any]]]]:
+        rows = self.conn.execute('SELECT run, stamp, record FROM runs WHERE fingerprint = ? AND instance_dir = ?',
+                                 (self.fingerprint, instance_dir))
+        return {run: (stamp, pickle.loads(record)) for run, stamp, record in rows}
+
+    def store(self, rows: List[Tuple[str, str, str, bytes]]) -> None:
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)',
+                                  [(self.fingerprint, *row) for row in rows])
+
+    def close(self) -> None:
+        self.conn.close()
+
 
-    def read_log(log_file):
+def zstd_stream(path: Union[Path, str]):
+    try:
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+    except ImportError:
+        if shutil.which('zstd') is None:
+            raise ImportError(f'Reading the zstd file {path} requires the python module "zstandard" '
+                              f'or the zstd command.')
+        return subprocess.Popen(['zstd', '-dcq', str(path)], stdout=subprocess.PIPE).stdout
+
+
+def log_path(log_file: Path) -> Path:
+    """
+    The compressed log written instead of the given one (log_codec), if it exists.
+    """
+    for ext in LOG_EXTENSIONS:
+        compressed = log_file.with_name(log_file.name + ext)
+        if compressed.exists():
+            return compressed
+    return log_file
+
+
+@contextmanager
+def readable_log(log_file: Path) -> Iterator[Path]:
+    """
+    The log itself or a temporary decompressed copy of its compressed version, so that log readers can open
+    every log as a plain file.
+    """
+    path = log_path(log_file)
+    if path == log_file:
+        yield log_file
+        return
+    tmp_dir = tempfile.mkdtemp(prefix='copperbench_')
+    try:
+        with (gzip.open(path, 'rb') if path.suffix == '.gz' else zstd_stream(path)) as fin, \
+                open(Path(tmp_dir, log_file.name), 'wb') as fout:
+            shutil.copyfileobj(fin, fout)
+        yield Path(tmp_dir, log_file.name)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def log_stamp(run_dir: Path, include_metrics: bool) -> str:
+    stamp = []
+    for log in LOG_FILES + (METRICS_FILES if include_metrics else []):
+        try:
+            st = os.stat(log_path(Path(run_dir, log)))
+            stamp.append(f'{st.st_size}:{st.st_mtime_ns}')
+        except FileNotFoundError:
+            stamp.append('-')
+    return ' '.join(stamp)
+
+
+class RegexReader:
+    """
+    Log reader returning the named groups of a regex matched against the whole log
+    (a class instead of a closure such that it can be sent to worker processes).
+    """
+
+    def __init__(self, regex: Pattern):
+        self.regex = regex
+
+    def __call__(self, log_file: Path) -> Optional[Dict[str, Any]]:
         with open(log_file, 'r') as file:
-            match = regex.match(file.read())
+            match = self.regex.match(file.read())
             if match != None:
                 return match.groupdict()
 
-    return process_bench(bench_folder, read_log, metadata_file, include_metrics=include_metrics)
+    def fingerprint(self) -> str:
+        return f'RegexReader:{self.regex.flags}:{self.regex.pattern}'
+
+
+def read_metrics(run_dir: Path) -> Dict[str, Any]:
+    entry = {}
+    for log, parse in [('node_info.log', parsers.parse_node_info), ('runsolver.log', parsers.parse_runsolver),
+                       ('varfile.log', parsers.parse_varfile), ('perf.log', parsers.parse_perf),
+                       ('timing.log', parsers.parse_timing), ('cgroup.log', parsers.parse_cgroup)]:
+        log_file = Path(run_dir, log)
+        if log_file.exists():
+            entry.update(parse(log_file))
+    return entry
+
+
+def process_run(run_dir: Path, conf_name: str, inst_name: str,
+                log_read_func: Callable[[Path], Optional[Dict[str, Any]]],
+                err_read_func: Callable[[Path], Optional[Dict[str, Any]]] = no_log,
+                include_metrics: bool = False) -> Optional[Dict[str, Any]]:
+    result = {}
+    with readable_log(Path(run_dir, 'stdout.log')) as log_file:
+        result_log = log_read_func(log_file)
+    if result_log:
+        result.update(result_log)
+    with readable_log(Path(run_dir, 'stderr.log')) as log_file:
+        result_err = err_read_func(log_file)
+    if result_err:
+        result.update(result_err)
+    if not result:
+        return None
+    entry = {'config': conf_name, 'instance': inst_name, 'run': run_dir.name[3:]}
+    if include_metrics:
+        entry.update(read_metrics(run_dir))
+    entry.update(result)
+    return entry
+
+
+def _process_instance_dir(instance_dir: Path, conf_name: str, inst_name: str,
+                          log_read_func: Callable[[Path], Optional[Dict[str, Any]]],
+                          err_read_func: Callable[[Path], Optional[Dict[str, Any]]],
+                          include_metrics: bool, cache_file: Optional[Path] = None, fingerprint: Optional[str] = None,
+                          cache_key: Optional[str] = None) -> Tuple[List[Dict[str, Any]], List[Tuple]]:
+    run_dirs = [Path(d.path) for d in os.scandir(instance_dir) if d.name.startswith('run') and d.is_dir()]
+    cached = {}
+    if cache_file is not None:
+        cache = ParseCache(cache_file, fingerprint)
+        cached = cache.lookup(cache_key)
+        cache.close()
+    data = []
+    updates = []
+    for run_dir in sorted(run_dirs, key=lambda d: natural_key(d.name)):
+        if cache_file is not None:
+            stamp = log_stamp(run_dir, include_metrics)
+            hit = cached.get(run_dir.name)
+            if hit is not None and hit[0] == stamp:
+                if hit[1] is not None:
+                    data.append({'config': conf_name, 'instance': inst_name} | hit[1])
+                continue
+        entry = process_run(run_dir, conf_name, inst_name, log_read_func, err_read_func, include_metrics)
+        if entry is not None:
+            data.append(entry)
+        if cache_file is not None:
+            # names are not cached as they depend on the metadata file
+            record = None if entry is None else {k: v for k, v in entry.items() if k not in ('config', 'instance')}
+            updates.append((cache_key, run_dir.name, stamp, pickle.dumps(record)))
+    return data, updates
+
+
+def instance_dirs(bench_folder: Union[Path, str], metadata: Optional[Dict[str, Any]] = None) -> List[Tuple[Path, str, str]]:
+    """
+    All config*/instance* folders of a benchmark in natural order together with their config and instance names.
+    """
+    dirs = []
+    configs = sorted((d for d in os.scandir(bench_folder) if d.name.startswith('config') and d.is_dir()),
+                     key=lambda d: natural_key(d.name))
+    for config_dir in configs:
+        instances = sorted((d for d in os.scandir(config_dir) if d.name.startswith('instance') and d.is_dir()),
+                           key=lambda d: natural_key(d.name))
+        for instance_dir in instances:
+            if metadata != None:
+                conf_name = metadata['configs'][config_dir.name]
+                inst_name = metadata['instances'][instance_dir.name]
+            else:
+                conf_name = config_dir.name
+                inst_name = instance_dir.name
+            dirs.append((Path(instance_dir.path), conf_name, inst_name))
+    return dirs
+
+
+def read_metadata(metadata_file: Optional[Union[Path, str]]) -> Optional[Dict[str, Any]]:
+    if metadata_file == None:
+        return None
+    with open(Path(metadata_file), 'r') as file:
+        return json.loads(file.read())
+
+
+def iter_bench(bench_folder: Union[Path, str], log_read_func: Callable[[Path], Optional[Dict[str, Any]]],
+               metadata_file: Optional[Union[Path, str]] = None, include_metrics: bool = False,
+               err_read_func: Callable[[Path], Optional[Dict[str, Any]]] = no_log,
+               workers: Optional[int] = None,
+               progress: Optional[Callable[[int, int], None]] = None,
+               cache: Union[bool, Path, str] = False) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yields the parsed runs of a benchmark, ordered by config, instance and run number.
+    With workers > 1 the config/instance folders are parsed by a pool of processes, which requires
+    log_read_func and err_read_func to be picklable (module-level functions or e.g. RegexReader, no lambdas).
+    progress is called with the number of parsed and the total number of config/instance folders.
+    With cache (True for postprocess_cache.sqlite in the benchmark folder, or the path of a cache file) parsed runs
+    are cached and only new runs, runs with changed logs or runs parsed by a different reader are parsed again.
+    """
+    bench_folder = Path(bench_folder)
+    metadata = read_metadata(metadata_file)
+    dirs = instance_dirs(bench_folder, metadata)
+
+    cache_file = None
+    fingerprint = None
+    parse_cache = None
+    if cache:
+        cache_file = Path(bench_folder, CACHE_FILE) if cache is True else Path(cache)
+        fingerprint = hashlib.sha1(' '.join([parser_fingerprint(log_read_func), parser_fingerprint(err_read_func),
+                                             str(METRICS_VERSION if include_metrics else None)]).encode()).hexdigest()
+        parse_cache = ParseCache(cache_file, fingerprint)
+        parse_cache.create()
+
+    def collect(done, result):
+        entries, updates = result
+        if updates:
+            parse_cache.store(updates)
+        if progress is not None:
+            progress(done, len(dirs))
+        return entries
+
+    def args(instance_dir, conf_name, inst_name):
+        return (instance_dir, conf_name, inst_name, log_read_func, err_read_func, include_metrics, cache_file,
+                fingerprint, instance_dir.relative_to(bench_folder).as_posix())
+
+    try:
+        if workers is None or workers <= 1:
+            for done, d in enumerate(dirs, start=1):
+                yield from collect(done, _process_instance_dir(*args(*d)))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # only a few folders per worker are in flight such that memory stays flat,
+                # results are collected in submission order to keep the output deterministic
+                pending = deque()
+                todo = iter(dirs)
+                done = 0
+                for d in todo:
+                    pending.append(executor.submit(_process_instance_dir, *args(*d)))
+                    if len(pending) >= 4 * workers:
+                        break
+                while pending:
+                    result = pending.popleft().result()
+                    d = next(todo, None)
+                    if d is not None:
+                        pending.append(executor.submit(_process_instance_dir, *args(*d)))
+                    done += 1
+                    yield from collect(done, result)
+    finally:
+        if parse_cache is not None:
+            parse_cache.close()
+
+
+def process_bench(bench_folder: Union[Path, str], log_read_func: Callable[[Path], Optional[Dict[str, Any]]],
+                  metadata_file: Optional[Union[Path, str]] = None, include_metrics: bool = False,
+                  err_read_func: Callable[[Path], Optional[Dict[str, Any]]] = no_log,
+                  workers: Optional[int] = None,
+                  progress: Optional[Callable[[int, int], None]] = None,
+                  cache: Union[bool, Path, str] = False) -> List[Dict[str, Any]]:
+    """
+    Parses every run of a benchmark, see iter_bench.
+    """
+    return list(iter_bench(bench_folder, log_read_func, metadata_file, include_metrics=include_metrics,
+                           err_read_func=err_read_func, workers=workers, progress=progress, cache=cache))
+
+
+def process_bench_regex(bench_folder: Union[Path, str], regex: Pattern,
+                        metadata_file: Optional[Union[Path, str]] = None, include_metrics: bool = False,
+                        workers: Optional[int] = None,
+                        progress: Optional[Callable[[int, int], None]] = None,
+                        cache: Union[bool, Path, str] = False) -> List[Dict[str, Any]]:
+    return process_bench(bench_folder, RegexReader(regex), metadata_file, include_metrics=include_metrics,
+                         workers=workers, progress=progress, cache=cache)
+
+
+def open_tar_stream(archive: Union[Path, str]) -> tarfile.TarFile:
+    """
+    Opens a (compressed) tar archive for a single sequential pass. Concatenated archives, e.g. the chunks
+    written in incremental_archive mode, are read completely.
+    """
+    with open(archive, 'rb') as fh:
+        magic = fh.read(6)
+    # tarfile's own decompression stops after the first member of concatenated compressed streams
+    if magic.startswith(MAGIC_ZSTD):
+        fileobj = zstd_stream(archive)
+    elif magic.startswith(b'\x1f\x8b'):
+        fileobj = gzip.open(archive, 'rb')
+    elif magic.startswith(b'BZh'):
+        import bz2
+        fileobj = bz2.open(archive, 'rb')
+    elif magic == b'\xfd7zXZ\x00':
+        import lzma
+        fileobj = lzma.open(archive, 'rb')
+    else:
+        fileobj = open(archive, 'rb')
+    return tarfile.open(fileobj=fileobj, mode='r|', ignore_zeros=True)
+
+
+def _run_member(name: str) -> Optional[Tuple[str, str, str, str]]:
+    # (config, instance, run, file) of a member like bench/config1/instance2/run3/stdout.log
+    parts = name.split('/')
+    for i in range(len(parts) - 3):
+        if (parts[i].startswith('config') and parts[i + 1].startswith('instance') and
+                parts[i + 2].startswith('run')):
+            if i + 4 == len(parts):
+                return parts[i], parts[i + 1], parts[i + 2], parts[i + 3]
+            return None
+    return None
+
+
+def archive_runs(archives: Union[Path, str, List[Union[Path, str]]], files: List[str]):
+    """
+    Streams over the archives and yields (config folder, instance folder, run folder) for every run,
+    where the run folder is a temporary folder containing the given files of the run.
+    The files of a run have to be stored consecutively, as tar and the incremental archives do.
+    """
+    if isinstance(archives, (Path, str)):
+        archives = [archives]
+    tmp_dir = Path(tempfile.mkdtemp(prefix='copperbench_'))
+    try:
+        for archive in archives:
+            with open_tar_stream(archive) as tar:
+                current = None
+                for member in tar:
+                    if not member.isfile():
+                        continue
+                    run = _run_member(member.name)
+                    if run is None or run[3] not in files:
+                        continue
+                    if run[:3] != current:
+                        if current is not None:
+                            yield current[0], current[1], tmp_dir / current[2]
+                            shutil.rmtree(tmp_dir / current[2])
+                        current = run[:3]
+                        os.makedirs(tmp_dir / current[2])
+                    with tar.extractfile(member) as fin, open(tmp_dir / run[2] / run[3], 'wb') as fout:
+                        shutil.copyfileobj(fin, fout)
+                if current is not None:
+                    yield current[0], current[1], tmp_dir / current[2]
+                    shutil.rmtree(tmp_dir / current[2])
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _iter_archive(archives, log_read_func, metadata_file, include_metrics, err_read_func):
+    metadata = read_metadata(metadata_file)
+    files = LOG_FILES + [f + ext for f in LOG_FILES for ext in LOG_EXTENSIONS]
+    files += METRICS_FILES if include_metrics else []
+    for config_dir, instance_dir, run_dir in archive_runs(archives, files):
+        if metadata != None:
+            conf_name = metadata['configs'][config_dir]
+            inst_name = metadata['instances'][instance_dir]
+        else:
+            conf_name = config_dir
+            inst_name = instance_dir
+        # logs missing in the archive are read as empty files like in the benchmark folder
+        for log in LOG_FILES:
+            if log_path(Path(run_dir, log)) == Path(run_dir, log):
+                Path(run_dir, log).touch()
+        entry = process_run(run_dir, conf_name, inst_name, log_read_func, err_read_func, include_metrics)
+        if entry is not None:
+            yield (natural_key(config_dir), natural_key(instance_dir), natural_key(run_dir.name)), entry
+
+
+def iter_archive(archives: Union[Path, str, List[Union[Path, str]]],
+                 log_read_func: Callable[[Path], Optional[Dict[str, Any]]],
+                 metadata_file: Optional[Union[Path, str]] = None, include_metrics: bool = False,
+                 err_read_func: Callable[[Path], Optional[Dict[str, Any]]] = no_log) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yields the parsed runs of the archive(s) written by compress_results.slurm
+    (.tar.gz, .tar.bz2, .tar.xz or .tar.zst) in the order they are stored in the archives.
+    """
+    for _, entry in _iter_archive(archives, log_read_func, metadata_file, include_metrics, err_read_func):
+        yield entry
+
+
+def process_archive(archives: Union[Path, str, List[Union[Path, str]]],
+                    log_read_func: Callable[[Path], Optional[Dict[str, Any]]],
+                    metadata_file: Optional[Union[Path, str]] = None, include_metrics: bool = False,
+                    err_read_func: Callable[[Path], Optional[Dict[str, Any]]] = no_log) -> List[Dict[str, Any]]:
+    """
+    Same as process_bench, but reads the runs directly from the archive(s) instead of an extracted benchmark folder.
+    """
+    data = sorted(_iter_archive(archives, log_read_func, metadata_file, include_metrics, err_read_func),
+                  key=lambda d: d[0])
+    return [entry for _, entry in data]
+
+
+def process_archive_regex(archives: Union[Path, str, List[Union[Path, str]]], regex: Pattern,
+                          metadata_file: Optional[Union[Path, str]] = None,
+                          include_metrics: bool = False) -> List[Dict[str, Any]]:
+    return process_archive(archives, RegexReader(regex), metadata_file, include_metrics=include_metrics)
+
+
+def _column_array(values: List[Any]):
+    import numpy as np
+    present = [v for v in values if v is not None]
+    if len(present) == len(values) and all(isinstance(v, bool) for v in present):
+        return np.array(values, dtype=bool)
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        if len(present) == len(values):
+            return np.array(values, dtype=np.int64)
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+class ColumnBuilder:
+    """
+    Collects records chunk-wise into typed numpy columns (int64, float64 with NaN for missing numbers, bool or
+    object with None for missing values), such that only one chunk of records is held as python dicts at a time.
+    """
+
+    def __init__(self, chunk_size: int = 100000):
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('The columnar output requires the python module "numpy".')
+        self.chunk_size = chunk_size
+        self.rows = 0
+        # per column a list of arrays, or numbers of rows where the column is missing
+        self.chunks = {}
+        self.buffer = []
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self.buffer.append(record)
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, records: Iterable[Dict[str, Any]]) -> 'ColumnBuilder':
+        for record in records:
+            self.append(record)
+        return self
+
+    def flush(self) -> None:
+        if len(self.buffer) == 0:
+            return
+        names = dict.fromkeys(self.chunks)
+        for record in self.buffer:
+            names.update(dict.fromkeys(record))
+        for name in names:
+            if name not in self.chunks:
+                self.chunks[name] = [self.rows] if self.rows > 0 else []
+            values = [record.get(name) for record in self.buffer]
+            if all(v is None for v in values):
+                self.chunks[name].append(len(values))
+            else:
+                self.chunks[name].append(_column_array(values))
+        self.rows += len(self.buffer)
+        self.buffer = []
+
+    def columns(self) -> Dict[str, Any]:
+        """
+        The columns as a dict of numpy arrays, e.g. for pandas.DataFrame(builder.columns()).
+        """
+        import numpy as np
+        self.flush()
+        columns = {}
+        for name, chunks in self.chunks.items():
+            kinds = {c.dtype.kind for c in chunks if not isinstance(c, int)}
+            missing = any(isinstance(c, int) for c in chunks)
+            if kinds == {'i'} and not missing:
+                dtype, fill = np.int64, None
+            elif kinds == {'b'} and not missing:
+                dtype, fill = bool, None
+            elif kinds <= {'i', 'f'} and kinds:
+                dtype, fill = np.float64, np.nan
+            else:
+                dtype, fill = object, None
+            arrays = []
+            for c in chunks:
+                if isinstance(c, int):
+                    c = np.full(c, fill, dtype=dtype)
+                arrays.append(c.astype(dtype))
+            columns[name] = np.concatenate(arrays)
+        return columns
+
+
+def write_parquet(records: Iterable[Dict[str, Any]], parquet_file: Union[Path, str], chunk_size: int = 100000) -> int:
+    """
+    Writes the records (e.g. from iter_bench) chunk-wise into a parquet file and returns the number of rows.
+    The schema is taken from the first chunk, columns appearing only later are not supported.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('Writing parquet files requires the python module "pyarrow".')
+    writer = None
+    rows = 0
+    chunk = []
+
+    def write():
+        nonlocal writer
+        table = pa.Table.from_pylist(chunk, schema=None if writer is None else writer.schema)
+        if writer is None:
+            writer = pq.ParquetWriter(str(parquet_file), table.schema)
+        else:
+            unknown = set().union(*chunk) - set(writer.schema.names)
+            if unknown:
+                raise ValueError(f'Columns {", ".join(sorted(unknown))} do not appear in the first {chunk_size} '
+                                 f'records, increase chunk_size.')
+        writer.write_table(table)
+
+    try:
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                write()
+                rows += len(chunk)
+                chunk = []
+        if chunk or writer is None:
+            write()
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
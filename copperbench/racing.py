@@ -0,0 +1,202 @@
+#!/usr/bin/false
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .parsers import parse_varfile
+from .tasks import read_start_list, task_folders
+
+RACE_FILE = 'race.json'
+
+
+def chi2_sf(x: float, df: int) -> float:
+    """
+    Survival function of the chi-squared distribution with an integer number of degrees of freedom.
+    """
+    if x <= 0:
+        return 1.0
+    if df % 2 == 0:
+        term = total = 1.0
+        for i in range(1, df // 2):
+            term *= (x / 2) / i
+            total += term
+        return min(1.0, math.exp(-x / 2) * total)
+    total = math.erfc(math.sqrt(x / 2))
+    term = math.sqrt(2 * x / math.pi) * math.exp(-x / 2)
+    for i in range(1, (df + 1) // 2):
+        total += term
+        term *= x / (2 * i + 1)
+    return min(1.0, total)
+
+
+def friedman(scores: List[List[float]]) -> Tuple[float, List[float]]:
+    """
+    Friedman test over the instances (rows) for the configs (columns), returns the p-value and the rank sums.
+    """
+    n, k = len(scores), len(scores[0])
+    rank_sums = [0.0] * k
+    for row in scores:
+        for j, s in enumerate(row):
+            less = sum(1 for t in row if t < s)
+            equal = sum(1 for t in row if t == s)
+            rank_sums[j] += 1 + less + (equal - 1) / 2
+    statistic = 12 / (n * k * (k + 1)) * sum(r * r for r in rank_sums) - 3 * n * (k + 1)
+    return chi2_sf(statistic, k - 1), rank_sums
+
+
+def run_score(run_folder: Path, timeout: float, k: float) -> float:
+    # PAR-k of the cpu time, runs without a varfile (e.g. crashed before runsolver started) are unsolved
+    varfile = run_folder / 'varfile.log'
+    values = parse_varfile(varfile) if varfile.exists() else {}
+    cputime = values.get('varfile_cputime')
+    if (not isinstance(cputime, (int, float)) or cputime > timeout or values.get('varfile_timeout') is True or
+            values.get('varfile_memout') is True):
+        return k * timeout
+    return cputime
+
+
+class LocalScheduler:
+    """
+    Runs the tasks on the local machine, a stand-in for slurm.
+    """
+
+    def __init__(self, bench_folder: Path, workers: int):
+        self.bench_folder = bench_folder
+        self.workers = workers
+        self.start_list = read_start_list(bench_folder)
+
+    def run(self, task_ids: List[int]) -> None:
+        def run_task(task_id):
+            subprocess.run(self.start_list[task_id - 1], shell=True, cwd=self.bench_folder,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(run_task, task_ids))
+
+
+class SlurmScheduler:
+    """
+    Submits the tasks as a job array of batch_job.slurm restricted to the given task ids and waits for it. The
+    throttle (max_parallel_jobs) of batch_job.slurm is kept, since --array replaces the one of the script.
+    """
+
+    def __init__(self, bench_folder: Path):
+        self.bench_folder = bench_folder
+        self.max_parallel_jobs = None
+        m = re.search(r'^#SBATCH --array=\S*%(\d+)', (bench_folder / 'batch_job.slurm').read_text(), re.M)
+        if m is not None:
+            self.max_parallel_jobs = int(m.group(1))
+
+    def run(self, task_ids: List[int]) -> None:
+        ranges = []
+        for task_id in sorted(task_ids):
+            if ranges and ranges[-1][1] == task_id - 1:
+                ranges[-1][1] = task_id
+            else:
+                ranges.append([task_id, task_id])
+        array = ','.join(f'{a}-{b}' if a != b else f'{a}' for a, b in ranges)
+        if self.max_parallel_jobs is not None:
+            array += f'%{self.max_parallel_jobs}'
+        subprocess.run(['sbatch', '--wait', f'--array={array}', 'batch_job.slurm'], cwd=self.bench_folder,
+                       check=True)
+
+
+def race(bench_folder: Path, scheduler, block: int = 10, alpha: float = 0.05, min_instances: int = 5,
+         k: float = 10) -> Dict[str, object]:
+    """
+    Runs the benchmark in blocks of instances. After each block the configs are compared by a Friedman test on the
+    PAR-k scores of all instances run so far and if it is significant, every config whose rank sum is worse than the
+    best one by more than the critical difference is eliminated, its remaining tasks are never scheduled.
+    """
+    with open(bench_folder / 'metadata.json') as fh:
+        metadata = json.loads(fh.read())
+    timeout = metadata['timeout']
+    folders = task_folders(bench_folder)
+    tasks = {}
+    for task_id, (config, instance, run) in enumerate(folders, start=1):
+        tasks.setdefault((config, instance), []).append((task_id, run))
+    configs = list(dict.fromkeys(c for c, _ in tasks))
+    instances = list(dict.fromkeys(i for _, i in tasks))
+
+    alive = list(configs)
+    eliminated = {}
+    done = []
+    scheduled = 0
+    for start in range(0, len(instances), block):
+        block_instances = instances[start:start + block]
+        task_ids = [task_id for c in alive for i in block_instances for task_id, run in tasks.get((c, i), [])
+                    if not (bench_folder / c / i / run / '00_finished.log').exists()]
+        scheduled += len(task_ids)
+        print(f'...Block {start // block + 1}: {len(block_instances)} instances, {len(alive)} configs, '
+              f'{len(task_ids)} tasks.', flush=True)
+        if len(task_ids) > 0:
+            scheduler.run(task_ids)
+        done += block_instances
+
+        if len(alive) < 2 or len(done) < min_instances:
+            continue
+        scores = [[statistics.mean(run_score(bench_folder / c / i / run, timeout, k) for _, run in tasks[(c, i)])
+                   for c in alive] for i in done if all((c, i) in tasks for c in alive)]
+        if len(scores) < min_instances:
+            continue
+        p_value, rank_sums = friedman(scores)
+        if p_value >= alpha:
+            continue
+        n, m = len(scores), len(alive)
+        critical = statistics.NormalDist().inv_cdf(1 - alpha) * math.sqrt(n * m * (m + 1) / 6)
+        best = min(rank_sums)
+        for c, r in zip(list(alive), rank_sums):
+            if r - best > critical:
+                alive.remove(c)
+                eliminated[c] = {'instances': len(done), 'p_value': p_value, 'rank_sum': r, 'best_rank_sum': best}
+                print(f'...Eliminated {metadata["configs"].get(c, c)} after {len(done)} instances '
+                      f'(p={p_value:.4f}).', flush=True)
+
+    result = {'alive': alive, 'eliminated': eliminated, 'scheduled_tasks': scheduled, 'total_tasks': len(folders)}
+    with open(bench_folder / RACE_FILE, 'w') as fh:
+        fh.write(json.dumps(result, indent=4))
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='copperbench race', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description='Runs a generated benchmark in blocks of instances and stops '
+                                                 'scheduling configs which are significantly worse (F-race).')
+    parser.add_argument('bench_folder')
+    parser.add_argument('--block', type=int, default=10, help='number of instances per block')
+    parser.add_argument('--alpha', type=float, default=0.05, help='significance level')
+    parser.add_argument('--min-instances', type=int, default=5, help='number of instances before the first test')
+    parser.add_argument('--par', type=float, default=10, help='penalty factor of unsolved runs (PAR-k)')
+    parser.add_argument('--scheduler', choices=['slurm', 'local'],
+                        default='slurm' if shutil.which('sbatch') is not None else 'local')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help='number of parallel runs of the local scheduler')
+    args = parser.parse_args(argv)
+
+    bench_folder = Path(args.bench_folder)
+    if not (bench_folder / 'metadata.json').exists():
+        print(f'{bench_folder} is not a benchmark folder (no metadata.json). Exiting...')
+        exit(2)
+    if 'timeout' not in json.loads((bench_folder / 'metadata.json').read_text()):
+        print(f'{bench_folder / "metadata.json"} does not record the timeout, regenerate the benchmark. Exiting...')
+        exit(2)
+    if args.scheduler == 'slurm':
+        batch_job = (bench_folder / 'batch_job.slurm').read_text()
+        if 'SLURM_ARRAY_TASK_ID - 1' in batch_job or 'next_task' in batch_job:
+            print('Racing on slurm requires one task per array element (no tasks_per_array_element, '
+                  'array_element_time or whole_node). Exiting...')
+            exit(2)
+        scheduler = SlurmScheduler(bench_folder)
+    else:
+        scheduler = LocalScheduler(bench_folder, args.workers)
+    result = race(bench_folder, scheduler, args.block, args.alpha, args.min_instances, args.par)
+    print(f'{len(result["alive"])} configs survived, scheduled {result["scheduled_tasks"]} of '
+          f'{result["total_tasks"]} tasks.')
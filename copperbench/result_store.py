@@ -0,0 +1,101 @@
+#!/usr/bin/false
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple, Union
+
+from .catalog import CHUNK_SIZE
+
+
+class FileHasher:
+    """
+    sha256 of files, cached by path, size and mtime. Entries of the instance catalog are used if available.
+    """
+
+    def __init__(self, catalog: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.catalog = catalog or {}
+        self.cache = {}
+
+    def digest(self, path: str) -> Optional[str]:
+        path = os.path.realpath(os.path.expanduser(path))
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        entry = self.catalog.get(path)
+        if entry is not None and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime:
+            return entry['sha256']
+        key = (path, st.st_size, st.st_mtime_ns)
+        if key not in self.cache:
+            checksum = hashlib.sha256()
+            with open(path, 'rb') as fh:
+                while True:
+                    chunk = fh.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    checksum.update(chunk)
+            self.cache[key] = checksum.hexdigest()
+        return self.cache[key]
+
+
+class ResultStore:
+    """
+    Content addressed store of finished runs. Every entry is a symlink named by the fingerprint of a run (hash of
+    the solver binary, the command, the input files and the limits) pointing to its run folder, the start scripts
+    add the entry once the run finished.
+    """
+
+    def __init__(self, path: Union[Path, str], hasher: FileHasher, limits: Dict[str, Any]):
+        self.path = Path(os.path.expanduser(path))
+        self.hasher = hasher
+        self.limits = limits
+        self.known = None
+
+    def pair_digest(self, cmd: str, shm_files: List[Tuple[Any, Any]]) -> str:
+        """
+        Fingerprint of a config/instance pair, the command of each run is added by run_fingerprint.
+        """
+        files = []
+        for orig_path, shm_path in shm_files:
+            orig_path = str(orig_path)
+            # folders are only identified by their path
+            files.append([str(shm_path), None if orig_path.startswith('-r ') else self.hasher.digest(orig_path)])
+        executable = cmd.split(' ')[0]
+        # a staged solver is identified by its source instead of its path in /dev/shm
+        staged = {str(shm_path): str(orig_path) for orig_path, shm_path in shm_files}
+        executable = staged.get(executable, executable)
+        return hashlib.sha256(json.dumps({'cmd': cmd, 'executable': self.hasher.digest(executable),
+                                          'files': files, 'limits': self.limits},
+                                         sort_keys=True).encode()).hexdigest()
+
+    @staticmethod
+    def run_fingerprint(pair_digest: str, run_cmd: str, run: int) -> str:
+        """
+        Fingerprint of a run from its resolved command, so the seed only matters if the command contains it.
+        """
+        return hashlib.sha256(f'{pair_digest} {run} {run_cmd}'.encode()).hexdigest()
+
+    @staticmethod
+    def entry(fingerprint: str) -> str:
+        return f'{fingerprint[:2]}/{fingerprint}'
+
+    def lookup(self, fingerprint: str) -> Optional[str]:
+        """
+        Run folder of a finished run with the given fingerprint, if any.
+        """
+        if self.known is None:
+            # list the store once instead of a stat per task
+            self.known = set()
+            if self.path.exists():
+                for shard in os.scandir(self.path):
+                    if shard.is_dir():
+                        self.known.update(os.listdir(shard.path))
+        if fingerprint not in self.known:
+            return None
+        run_folder = os.path.realpath(self.path / self.entry(fingerprint))
+        if not os.path.exists(os.path.join(run_folder, '00_finished.log')):
+            return None
+        return run_folder
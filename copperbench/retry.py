@@ -0,0 +1,230 @@
+#!/usr/bin/false
+import argparse
+import datetime
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import jinja2
+
+from .parsers import parse_cgroup, parse_node_info, parse_runsolver, parse_varfile, read_tail
+from .tasks import active_jobs, job_name, read_start_list, task_folders
+
+RETRY_FILE = 'retry.json'
+RETRY_START_LIST = 'retry_start_list.txt'
+RETRY_JOB = 'retry_batch_job.slurm'
+STATUSES = ['finished', 'timeout', 'memout', 'solver_error', 'infrastructure', 'not_started']
+
+REGEX_SLURM_LOG = re.compile(r'^slurm-(?:retry(?P<round>\d+)-)?\d+_(?P<index>\d+)_stderr\.log$')
+REGEX_SLURM_ERROR = re.compile(r'CANCELLED AT \S+ DUE TO (?P<cancel>[A-Z ]+)|(?P<space>No space left on device)|'
+                               r'(?P<oom>oom[-_ ]kill)|(?P<bus>Bus error)', re.I)
+REGEX_SLURM_NODE = re.compile(r'\*\*\* (?:JOB|STEP) \S+ ON (?P<node>\S+) CANCELLED')
+REGEX_TIME = re.compile(r'^(?:(?P<days>\d+) days?, )?(?P<h>\d+):(?P<m>\d+):(?P<s>\d+)$')
+REGEX_PACKED = re.compile(r'first=\$\(\( \(SLURM_ARRAY_TASK_ID - 1\) \* (?P<n>\d+) \+ 1 \)\)')
+
+
+def classify_run(run_folder: Path, ok_codes: List[int]) -> Tuple[str, Optional[str]]:
+    """
+    Status of a run (one of STATUSES) and the node it ran on, if known.
+    """
+    node_info = run_folder / 'node_info.log'
+    node = parse_node_info(node_info).get('slurm_node') if node_info.exists() else None
+    if not node_info.exists() and not (run_folder / '00_finished.log').exists():
+        return 'not_started', None
+    if not (run_folder / '00_finished.log').exists():
+        return 'infrastructure', node
+    varfile = run_folder / 'varfile.log'
+    runsolver = run_folder / 'runsolver.log'
+    if (run_folder / 'cgroup.log').exists():
+        # cgroup resource backend
+        runsolver = run_folder / 'cgroup.log'
+    # runsolver never got to write its logs, e.g. /dev/shm was full or the node was lost
+    if not varfile.exists() or varfile.stat().st_size == 0 or not runsolver.exists() or runsolver.stat().st_size == 0:
+        return 'infrastructure', node
+    values = parse_varfile(varfile)
+    if values.get('varfile_timeout') is True:
+        return 'timeout', node
+    if values.get('varfile_memout') is True:
+        return 'memout', node
+    if runsolver.name == 'cgroup.log':
+        values = {'runsolver_exit_status': parse_cgroup(runsolver).get('cgroup_exit', 0)}
+    else:
+        values = parse_runsolver(runsolver)
+    if 'runsolver_signal' in values or values.get('runsolver_exit_status', 0) not in ok_codes:
+        return 'solver_error', node
+    return 'finished', node
+
+
+def slurm_errors(bench_folder: Path, rounds: List[List[int]]) -> Dict[int, Tuple[str, Optional[str]]]:
+    """
+    Errors reported by slurm (cancellation, full disk, oom kill) and the node, by task id. The array indices of
+    retry job N are mapped to task ids through the task ids of the Nth retry.
+    """
+    logs = bench_folder / 'slurm_logs'
+    if not logs.exists():
+        return {}
+    batch_job = (bench_folder / 'batch_job.slurm').read_text()
+    packed = REGEX_PACKED.search(batch_job)
+    tasks_per_element = int(packed.group('n')) if packed is not None else 1
+    errors = {}
+    for entry in os.scandir(logs):
+        m = REGEX_SLURM_LOG.match(entry.name)
+        if m is None or entry.stat().st_size == 0:
+            continue
+        text = read_tail(entry.path)
+        error = REGEX_SLURM_ERROR.search(text)
+        if error is None:
+            continue
+        reason = error.group('cancel') or error.group('space') or error.group('oom') or error.group('bus')
+        node = REGEX_SLURM_NODE.search(text)
+        index = int(m.group('index'))
+        if m.group('round') is not None:
+            retry_round = int(m.group('round'))
+            if retry_round > len(rounds) or index > len(rounds[retry_round - 1]):
+                continue
+            ids = [rounds[retry_round - 1][index - 1]]
+        else:
+            ids = range((index - 1) * tasks_per_element + 1, index * tasks_per_element + 1)
+        for task_id in ids:
+            errors[task_id] = (reason.strip().lower(), node.group('node') if node is not None else None)
+    return errors
+
+
+def parse_time(value: str) -> int:
+    m = REGEX_TIME.match(value)
+    return (int(m.group('days') or 0) * 86400 + int(m.group('h')) * 3600 + int(m.group('m')) * 60 +
+            int(m.group('s')))
+
+
+def write_retry_job(bench_folder: Path, templateEnv: jinja2.Environment, retry_round: int, num_tasks: int,
+                    exclude: List[str]) -> None:
+    """
+    Writes a job array over the retry start list with the resources of batch_job.slurm, one run per element.
+    """
+    batch_job = (bench_folder / 'batch_job.slurm').read_text()
+    packed = REGEX_PACKED.search(batch_job)
+    tasks_per_element = int(packed.group('n')) if packed is not None else 1
+    sbatch_lines = []
+    slurm_time = None
+    max_parallel_jobs = None
+    for line in batch_job.splitlines():
+        if not line.startswith('#SBATCH '):
+            continue
+        option = line[len('#SBATCH '):]
+        if option.startswith('--time='):
+            slurm_time = parse_time(option[len('--time='):]) // tasks_per_element
+        elif option.startswith('--array='):
+            if '%' in option:
+                max_parallel_jobs = int(option.split('%')[1].rstrip(':'))
+        elif not option.startswith(('--output=', '--error=')):
+            sbatch_lines.append(line)
+    bench_path = re.search(r'^cd ~/(.*)$', batch_job, re.M).group(1)
+    template = templateEnv.get_template('retry_job.slurm.jinja2')
+    with open(bench_folder / RETRY_JOB, 'w') as fh:
+        fh.write(template.render(sbatch_lines=sbatch_lines, slurm_timeout=datetime.timedelta(seconds=slurm_time),
+                                 write_scheduler_logs='--output=/dev/null' not in batch_job,
+                                 output_path='slurm_logs', retry_round=retry_round,
+                                 max_parallel_jobs=max_parallel_jobs,
+                                 num_tasks=num_tasks, exclude=','.join(exclude), bench_path=bench_path))
+
+
+def retry(bench_folder: Path, ok_codes: List[int], solver_errors: bool = False, max_node_failures: int = 2,
+          workers: Optional[int] = None, dry_run: bool = False) -> Dict[str, object]:
+    """
+    Classifies every run of a benchmark and writes a start list and job array of the runs which need to be run
+    again (infrastructure failures, runs which never started and optionally solver errors). Nodes with at least
+    max_node_failures infrastructure failures are excluded.
+    """
+    start_list = read_start_list(bench_folder)
+    folders = task_folders(bench_folder)
+    run_folders = [bench_folder / config / instance / run for config, instance, run in folders]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        statuses = list(executor.map(lambda f: classify_run(f, ok_codes), run_folders))
+    rounds = []
+    if (bench_folder / RETRY_FILE).exists():
+        with open(bench_folder / RETRY_FILE) as fh:
+            rounds = json.loads(fh.read())['rounds']
+    errors = slurm_errors(bench_folder, rounds)
+
+    tasks = {status: [] for status in STATUSES}
+    reasons = {}
+    node_failures = {}
+    for task_id, (status, node) in enumerate(statuses, start=1):
+        if status in ('infrastructure', 'not_started') and task_id in errors:
+            reason, error_node = errors[task_id]
+            reasons[task_id] = reason
+            node = node or error_node
+            # the run was started before slurm killed it
+            status = 'infrastructure'
+        tasks[status].append(task_id)
+        if status == 'infrastructure' and node is not None:
+            node_failures[node] = node_failures.get(node, 0) + 1
+    exclude = sorted(n for n, c in node_failures.items() if c >= max_node_failures)
+
+    retry_ids = sorted(tasks['infrastructure'] + tasks['not_started'] + (tasks['solver_error'] if solver_errors else []))
+    result = {'counts': {status: len(ids) for status, ids in tasks.items()}, 'retry_tasks': retry_ids,
+              'excluded_nodes': exclude, 'node_failures': node_failures,
+              'reasons': {str(k): v for k, v in reasons.items()}, 'solver_errors': tasks['solver_error']}
+    if dry_run or len(retry_ids) == 0:
+        return result
+
+    # start scripts skip runs which already finished
+    for task_id in retry_ids:
+        finished = run_folders[task_id - 1] / '00_finished.log'
+        if finished.exists():
+            finished.unlink()
+    with open(bench_folder / RETRY_START_LIST, 'w') as fh:
+        fh.writelines(f'{start_list[task_id - 1]}\n' for task_id in retry_ids)
+    templateLoader = jinja2.FileSystemLoader(searchpath=f"{os.path.dirname(__file__)}/templates/")
+    write_retry_job(bench_folder, jinja2.Environment(loader=templateLoader), len(rounds) + 1, len(retry_ids),
+                    exclude)
+    result['rounds'] = rounds + [retry_ids]
+    with open(bench_folder / RETRY_FILE, 'w') as fh:
+        fh.write(json.dumps(result, indent=4))
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='copperbench retry', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description='Classifies the runs of a finished benchmark and writes '
+                                                 f'{RETRY_START_LIST} and {RETRY_JOB} with the runs which failed '
+                                                 'for reasons other than the solver.')
+    parser.add_argument('bench_folder')
+    parser.add_argument('--ok-codes', type=int, nargs='+', default=[0, 10, 20],
+                        help='exit codes of runs which are not solver errors')
+    parser.add_argument('--solver-errors', action='store_true', help='also retry runs with solver errors')
+    parser.add_argument('--max-node-failures', type=int, default=2,
+                        help='exclude nodes with at least this many infrastructure failures')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of threads classifying the runs')
+    parser.add_argument('--dry-run', action='store_true', help='only print the classification')
+    args = parser.parse_args(argv)
+
+    bench_folder = Path(args.bench_folder)
+    if not (bench_folder / 'metadata.json').exists():
+        print(f'{bench_folder} is not a benchmark folder (no metadata.json). Exiting...')
+        exit(2)
+    if 'next_task' in (bench_folder / 'batch_job.slurm').read_text():
+        print('Retrying is not supported for whole_node benchmarks. Exiting...')
+        exit(2)
+    # runs of a job which is still queued or running would be classified as failed or not started and run twice
+    active = active_jobs(job_name(bench_folder))
+    if active:
+        print(f'Jobs {", ".join(sorted(active))} of this benchmark are still queued or running, wait until they '
+              f'finished or cancel them. Exiting...')
+        exit(2)
+    if active is None:
+        print('...Cannot query squeue, make sure no job of this benchmark is still queued or running.')
+    result = retry(bench_folder, args.ok_codes, args.solver_errors, args.max_node_failures, args.workers,
+                   args.dry_run)
+    print(', '.join(f'{status}: {count}' for status, count in result['counts'].items()))
+    if len(result['excluded_nodes']) > 0:
+        print(f'...Excluding nodes {", ".join(result["excluded_nodes"])}.')
+    if len(result['retry_tasks']) == 0:
+        print('No runs to retry.')
+    elif args.dry_run:
+        print(f'{len(result["retry_tasks"])} runs would be retried.')
+    else:
+        print(f'{len(result["retry_tasks"])} runs to retry, submit {RETRY_JOB} with sbatch.')
@@ -0,0 +1,114 @@
+#!/usr/bin/false
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union, Iterator
+
+import numpy as np
+
+from .postprocess import instance_dirs, natural_key, read_metadata
+
+MAGIC = b'CBTS'
+HEADER = struct.Struct('<HHI')
+SERIES_FILES = {'resources': 'resources.bin', 'counters': 'counters.bin'}
+
+
+def read_series(series_file: Union[Path, str]) -> np.ndarray:
+    """
+    Memory maps a series file written by the sampler as a structured float32 array with one field per column
+    (time in seconds since the start of the run first). Rows of a partially written last row are ignored.
+    """
+    with open(series_file, 'rb') as fh:
+        magic = fh.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f'{series_file} is not a series file')
+        version, ncols, names_len = HEADER.unpack(fh.read(HEADER.size))
+        if version != 1:
+            raise ValueError(f'{series_file} has the unsupported version {version}')
+        names = fh.read(names_len).decode().split('\0')
+    offset = len(MAGIC) + HEADER.size + names_len
+    dtype = np.dtype([(name, '<f4') for name in names])
+    rows = (os.path.getsize(series_file) - offset) // dtype.itemsize
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(series_file, dtype=dtype, mode='r', offset=offset, shape=(rows,))
+
+
+@dataclass
+class RunSeries:
+    """
+    Series file of a single run, read on first access of data.
+    """
+    config: str
+    instance: str
+    run: str
+    path: Path
+    _data: Optional[np.ndarray] = None
+
+    @property
+    def data(self) -> np.ndarray:
+        if self._data is None:
+            self._data = read_series(self.path)
+        return self._data
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.data.dtype.names)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.data[column]
+
+
+def iter_series(bench_folder: Union[Path, str], kind: str = 'resources',
+                metadata_file: Optional[Union[Path, str]] = None) -> Iterator[RunSeries]:
+    """
+    Lazily yields the series (resources or counters) of every run of a benchmark which has one, ordered by config,
+    instance and run number. Nothing but the directory listings is read until the data of a run is accessed.
+    """
+    file_name = SERIES_FILES[kind]
+    for instance_dir, conf_name, inst_name in instance_dirs(bench_folder, read_metadata(metadata_file)):
+        runs = sorted((d for d in os.scandir(instance_dir) if d.name.startswith('run') and d.is_dir()),
+                      key=lambda d: natural_key(d.name))
+        for run_dir in runs:
+            path = Path(run_dir.path, file_name)
+            if path.exists():
+                yield RunSeries(conf_name, inst_name, run_dir.name, path)
+
+
+def load_series(bench_folder: Union[Path, str], kind: str = 'resources',
+                metadata_file: Optional[Union[Path, str]] = None) -> List[RunSeries]:
+    return list(iter_series(bench_folder, kind, metadata_file))
+
+
+def on_grid(runs: List[RunSeries], column: str, grid: np.ndarray, fill: float = np.nan) -> np.ndarray:
+    """
+    Resamples a column of several runs onto a common time grid (one row per run), each grid point takes the last
+    sample at or before it. Points before the first sample are fill, points after the last sample keep its value.
+    """
+    grid = np.asarray(grid, dtype=np.float64)
+    result = np.full((len(runs), len(grid)), fill, dtype=np.float64)
+    for i, run in enumerate(runs):
+        data = run.data
+        if len(data) == 0:
+            continue
+        idx = np.searchsorted(data['time'], grid, side='right') - 1
+        valid = idx >= 0
+        result[i, valid] = data[column][idx[valid]]
+    return result
+
+
+def summarize(runs: List[RunSeries]) -> Dict[str, np.ndarray]:
+    """
+    Peak RSS, mean CPU utilization and number of samples of resource series, one entry per run.
+    """
+    peak_rss = np.full(len(runs), np.nan)
+    mean_cpu = np.full(len(runs), np.nan)
+    samples = np.zeros(len(runs), dtype=np.int64)
+    for i, run in enumerate(runs):
+        data = run.data
+        samples[i] = len(data)
+        if len(data) > 0:
+            peak_rss[i] = data['rss'].max()
+            mean_cpu[i] = data['cpu'].mean()
+    return {'peak_rss': peak_rss, 'mean_cpu': mean_cpu, 'samples': samples}
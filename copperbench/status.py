@@ -0,0 +1,185 @@
+#!/usr/bin/false
+import argparse
+import datetime
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from .tasks import active_jobs
+
+STATUS_FOLDER = 'status'
+STATE_FILE = 'monitor_state.json'
+THROUGHPUT_WINDOW = 3600
+# slurm_time_buffer and runsolver_kill_delay of benchmarks which do not store their slurm time
+DEFAULT_SLURM_SLACK = 15
+
+
+class StatusJournal:
+    """
+    Aggregated state of the status journals written by the start scripts (status_journal). Every journal is only
+    read from the offset up to which it was read before, so each poll costs the records written since the last one.
+    Records are '<epoch> start <run>', '<epoch> end <run> <ok|timeout|memout> <exit code>' and
+    '<epoch> killed <run>'. A run which started but has no end record (the node failed or the run was killed before
+    it could write one) is lost once its array job left the queue or it is older than the slurm time of a run.
+    """
+
+    def __init__(self, bench_folder: Path, ok_codes: List[int]):
+        self.folder = bench_folder / STATUS_FOLDER
+        self.ok_codes = set(ok_codes)
+        self.offsets = {}
+        self.counts = {'ok': 0, 'failed': 0, 'timeout': 0, 'memout': 0, 'killed': 0}
+        self.running = {}
+        # only unsuccessful runs are remembered individually, so a rerun which succeeds is not counted twice
+        self.unsuccessful = {}
+        self.recent = []
+        self.first = None
+
+    @classmethod
+    def load(cls, bench_folder: Path, ok_codes: List[int]) -> 'StatusJournal':
+        journal = cls(bench_folder, ok_codes)
+        state_file = journal.folder / STATE_FILE
+        if state_file.exists():
+            with open(state_file) as fh:
+                state = json.loads(fh.read())
+            if set(state['ok_codes']) == journal.ok_codes:
+                for key in ['offsets', 'counts', 'running', 'unsuccessful', 'recent', 'first']:
+                    setattr(journal, key, state[key])
+        return journal
+
+    def save(self) -> None:
+        with open(self.folder / f'{STATE_FILE}.tmp', 'w') as fh:
+            fh.write(json.dumps({'ok_codes': sorted(self.ok_codes), 'offsets': self.offsets, 'counts': self.counts,
+                                 'running': self.running, 'unsuccessful': self.unsuccessful, 'recent': self.recent,
+                                 'first': self.first}))
+        os.replace(self.folder / f'{STATE_FILE}.tmp', self.folder / STATE_FILE)
+
+    def _finish(self, run: str, status: str) -> None:
+        previous = self.unsuccessful.pop(run, None)
+        if previous is not None:
+            self.counts[previous] -= 1
+        self.counts[status] += 1
+        if status != 'ok':
+            self.unsuccessful[run] = status
+
+    def _record(self, fields: List[str], job: str) -> None:
+        stamp, event, run = int(fields[0]), fields[1], fields[2]
+        if self.first is None or stamp < self.first:
+            self.first = stamp
+        if event == 'start':
+            self.running[run] = [stamp, job]
+            return
+        self.running.pop(run, None)
+        if event == 'killed':
+            self._finish(run, 'killed')
+        elif event == 'end':
+            status = fields[3]
+            if status == 'ok' and int(fields[4]) not in self.ok_codes:
+                status = 'failed'
+            self._finish(run, status)
+        self.recent.append(stamp)
+
+    def update(self) -> None:
+        if not self.folder.exists():
+            return
+        for entry in os.scandir(self.folder):
+            if not entry.name.endswith('.log'):
+                continue
+            offset = self.offsets.get(entry.name, 0)
+            if entry.stat().st_size <= offset:
+                continue
+            with open(entry.path, 'rb') as fh:
+                fh.seek(offset)
+                data = fh.read()
+            # a record which is still being written is read again by the next poll
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].decode(errors='replace').splitlines():
+                fields = line.split()
+                if len(fields) >= 3 and fields[0].isdigit():
+                    # journals are named <array job id>_<node>.log
+                    self._record(fields, entry.name.split('_')[0])
+            self.offsets[entry.name] = offset + end
+        self.recent = [t for t in self.recent if t >= time.time() - THROUGHPUT_WINDOW]
+
+    def lost(self, slurm_time: float, active: Optional[Set[str]] = None) -> List[str]:
+        """
+        Runs without an end record which cannot be running anymore, active are the array job ids still in the queue
+        (None if unknown).
+        """
+        now = time.time()
+        return [run for run, (stamp, job) in self.running.items()
+                if now - stamp > slurm_time or (active is not None and job != 'local' and job not in active)]
+
+    def report(self, total: int, slurm_time: float, active: Optional[Set[str]] = None) -> Dict[str, object]:
+        now = time.time()
+        lost = len(self.lost(slurm_time, active))
+        finished = sum(self.counts.values())
+        if len(self.recent) > 0 and self.first is not None and now - self.first >= THROUGHPUT_WINDOW:
+            throughput = len(self.recent) / THROUGHPUT_WINDOW * 3600
+        elif self.first is not None and now > self.first:
+            throughput = finished / (now - self.first) * 3600
+        else:
+            throughput = 0.0
+        remaining = max(0, total - finished)
+        eta = remaining / throughput * 3600 if throughput > 0 else None
+        return {'total': total, 'finished': finished, 'running': len(self.running) - lost, 'lost': lost,
+                **self.counts, 'throughput': throughput, 'eta': eta}
+
+
+def count_tasks(bench_folder: Path) -> int:
+    with open(bench_folder / 'start_list.txt', 'rb') as fh:
+        return sum(chunk.count(b'\n') for chunk in iter(lambda: fh.read(1 << 20), b''))
+
+
+def read_slurm_time(bench_folder: Path) -> float:
+    with open(bench_folder / 'metadata.json') as fh:
+        metadata = json.loads(fh.read())
+    return metadata.get('slurm_time', metadata['timeout'] + DEFAULT_SLURM_SLACK)
+
+
+def print_report(report: Dict[str, object]) -> None:
+    total = report['total']
+    print(f'{report["finished"]}/{total} finished ({100 * report["finished"] / max(total, 1):.1f}%), '
+          f'{report["running"]} running, {report["lost"]} lost')
+    print(f'  ok: {report["ok"]}, failed: {report["failed"]}, timeout: {report["timeout"]}, '
+          f'memout: {report["memout"]}, killed: {report["killed"]}')
+    eta = 'unknown' if report['eta'] is None else str(datetime.timedelta(seconds=round(report['eta'])))
+    print(f'  throughput: {report["throughput"]:.1f} tasks/h, ETA: {eta}', flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='copperbench status', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description='Reports the progress of a running benchmark from the status '
+                                                 'journals written by the start scripts (status_journal).')
+    parser.add_argument('bench_folder')
+    parser.add_argument('--watch', type=float, default=None, metavar='SECONDS',
+                        help='poll the journals every SECONDS seconds until every task finished')
+    parser.add_argument('--ok-codes', type=int, nargs='+', default=[0, 10, 20],
+                        help='exit codes of runs which are not failures')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args(argv)
+
+    bench_folder = Path(args.bench_folder)
+    if not (bench_folder / 'start_list.txt').exists():
+        print(f'{bench_folder} is not a benchmark folder (no start_list.txt). Exiting...')
+        exit(2)
+    if not (bench_folder / STATUS_FOLDER).exists():
+        print(f'No status journal in {bench_folder}, generate the benchmark with status_journal enabled '
+              f'(or no run started yet).')
+    total = count_tasks(bench_folder)
+    slurm_time = read_slurm_time(bench_folder)
+    journal = StatusJournal.load(bench_folder, args.ok_codes)
+    while True:
+        journal.update()
+        if (bench_folder / STATUS_FOLDER).exists():
+            journal.save()
+        active = active_jobs() if len(journal.running) > 0 else None
+        report = journal.report(total, slurm_time, active)
+        if args.json:
+            print(json.dumps(report), flush=True)
+        else:
+            print_report(report)
+        if args.watch is None or report['finished'] + report['lost'] >= total:
+            break
+        time.sleep(args.watch)
@@ -0,0 +1,67 @@
+#!/usr/bin/false
+import getpass
+import json
+import re
+import shlex
+import shutil
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Set, Tuple, Union
+
+from .bench import TaskTable
+
+REGEX_RUNNER = re.compile(r'^\./runner\.sh (\d+)$')
+REGEX_LOG_FOLDER = re.compile(r'^log_folder="\$HOME"/(.*?); input_line=')
+REGEX_JOB_NAME = re.compile(r'^#SBATCH --job-name=(.*)$', re.M)
+
+
+def read_start_list(bench_folder: Union[Path, str]) -> List[str]:
+    with open(Path(bench_folder, 'start_list.txt')) as fh:
+        return [line.strip() for line in fh if len(line.strip()) > 0]
+
+
+def task_folders(bench_folder: Union[Path, str]) -> List[Tuple[str, str, str]]:
+    """
+    (config folder, instance folder, run folder) of every task, task id N is at index N - 1.
+    """
+    bench_folder = Path(bench_folder)
+    with open(bench_folder / 'metadata.json') as fh:
+        metadata = json.loads(fh.read())
+    if 'tasks' in metadata:
+        return [(config, instance, f'run{run}') for config, instance, run in metadata['tasks']]
+    start_list = read_start_list(bench_folder)
+    if len(start_list) == 0 or REGEX_RUNNER.match(start_list[0]) is None:
+        return [tuple(line.split('/')[-4:-1]) for line in start_list]
+    # manifest mode: the run folder is the log folder of the row of the task table
+    with open(bench_folder / 'task_table.idx', 'rb') as fh:
+        index = fh.read()
+    folders = []
+    with open(bench_folder / 'task_table.txt', 'rb') as fh:
+        for line in start_list:
+            task_id = int(REGEX_RUNNER.match(line).group(1))
+            fh.seek(int(index[(task_id - 1) * TaskTable.INDEX_WIDTH:task_id * TaskTable.INDEX_WIDTH]))
+            row = fh.readline().decode()
+            log_folder = shlex.split(REGEX_LOG_FOLDER.match(row).group(1))[0]
+            folders.append(tuple(log_folder.split('/')[-3:]))
+    return folders
+
+
+def job_name(bench_folder: Union[Path, str]) -> Optional[str]:
+    m = REGEX_JOB_NAME.search(Path(bench_folder, 'batch_job.slurm').read_text())
+    return m.group(1).strip() if m is not None else None
+
+
+def active_jobs(name: Optional[str] = None) -> Optional[Set[str]]:
+    """
+    Array job ids of the queued or running jobs of the user (with the given job name), None if slurm cannot be asked.
+    """
+    if shutil.which('squeue') is None:
+        return None
+    cmd = ['squeue', '-h', '-u', getpass.getuser(), '-o', '%F']
+    if name is not None:
+        cmd += ['-n', name]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=60).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return set(out.split())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+
+MAGIC = b'CBTS'
+VERSION = 1
+INTERVAL = {{ sample_interval }}
+EVENTS = {{ sample_events }}
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+# measurement processes between the limiter and the solver (use_perf and sample_events)
+WRAPPERS = {'perf'}
+
+
+class SeriesWriter:
+    """
+    Appends float32 rows to a series file: magic, version, number of columns, length of the column names,
+    the column names separated by NUL and the rows. A run which is killed still leaves a readable file.
+    """
+
+    def __init__(self, path, columns):
+        names = '\0'.join(columns).encode()
+        self.fh = open(path, 'wb')
+        self.fh.write(MAGIC + struct.pack('<HHI', VERSION, len(columns), len(names)) + names)
+        self.row = struct.Struct(f'<{len(columns)}f')
+
+    def write(self, *values):
+        self.fh.write(self.row.pack(*values))
+        self.fh.flush()
+
+    def close(self):
+        self.fh.close()
+
+
+def children(pid):
+    # through /proc/<pid>/task/<tid>/children
+    pids = []
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as fh:
+                pids.extend(int(p) for p in fh.read().split())
+    except OSError:
+        pass
+    return pids
+
+
+def comm(pid):
+    try:
+        with open(f'/proc/{pid}/comm') as fh:
+            return fh.read().strip()
+    except OSError:
+        return None
+
+
+def descendants(pid):
+    pids = [pid]
+    i = 0
+    while i < len(pids):
+        pids.extend(children(pids[i]))
+        i += 1
+    return pids
+
+
+def solver_pids(pid):
+    """
+    The process tree of the solver below the limiter pid (runsolver or timeout). The limiter and the perf processes
+    wrapping the solver are left out, their cutime and cstime count the solver again once it is reaped.
+    """
+    wrappers = [pid]
+    pids = []
+    i = 0
+    while i < len(wrappers):
+        for p in children(wrappers[i]):
+            if comm(p) in WRAPPERS:
+                wrappers.append(p)
+            else:
+                pids.extend(descendants(p))
+        i += 1
+    return pids
+
+
+def sample_procs(pid):
+    rss = 0
+    ticks = 0
+    for p in solver_pids(pid):
+        try:
+            with open(f'/proc/{p}/statm') as fh:
+                rss += int(fh.read().split()[1]) * PAGE_SIZE
+            with open(f'/proc/{p}/stat') as fh:
+                # utime, stime, cutime and cstime, the comm field may contain spaces
+                fields = fh.read().rsplit(')', 1)[1].split()
+                ticks += sum(int(f) for f in fields[11:15])
+        except (OSError, IndexError):
+            pass
+    return rss, ticks / CLOCK_TICKS
+
+
+def sample_cgroup(cgroup):
+    with open(f'{cgroup}/memory.current') as fh:
+        rss = int(fh.read())
+    with open(f'{cgroup}/cpu.stat') as fh:
+        usage = int(fh.readline().split()[1])
+    return rss, usage / 1e6
+
+
+def convert_perf(csv_file, path):
+    # interval lines of perf stat -I -x, are: time, value, unit, event, ...
+    rows = {}
+    with open(csv_file) as fh:
+        for line in fh:
+            fields = line.strip().split(',')
+            if len(fields) < 4 or line.startswith('#') or fields[3] not in EVENTS:
+                continue
+            try:
+                value = float(fields[1])
+            except ValueError:
+                value = float('nan')
+            rows.setdefault(float(fields[0]), {})[fields[3]] = value
+    writer = SeriesWriter(path, ['time'] + EVENTS)
+    for t, values in sorted(rows.items()):
+        writer.write(t, *(values.get(e, float('nan')) for e in EVENTS))
+    writer.close()
+    os.unlink(csv_file)
+
+
+def main():
+    pid = int(sys.argv[1])
+    out = Path(sys.argv[2])
+    cgroup = sys.argv[3] if len(sys.argv) > 3 and sys.argv[3] != '' else None
+    sample = (lambda: sample_cgroup(cgroup)) if cgroup is not None else (lambda: sample_procs(pid))
+    writer = SeriesWriter(out / 'resources.bin', ['time', 'rss', 'cpu'])
+    start = last_time = time.monotonic()
+    last_cpu = None
+    while True:
+        alive = os.path.exists(f'/proc/{pid}')
+        # the cgroup outlives the solver until the start script collected it, which waits for the last sample
+        if not alive and cgroup is None:
+            break
+        try:
+            rss, cpu = sample()
+        except OSError:
+            break
+        now = time.monotonic()
+        # utilization in cores since the previous sample
+        writer.write(now - start, rss, (cpu - last_cpu) / (now - last_time) if last_cpu is not None else 0.0)
+        last_time, last_cpu = now, cpu
+        if not alive:
+            break
+        time.sleep(INTERVAL)
+    writer.close()
+    if len(EVENTS) > 0 and (out / 'perf_series.csv').exists():
+        convert_perf(out / 'perf_series.csv', out / 'counters.bin')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,49 +1,201 @@
 #!/usr/bin/env python
-import atexit
+import argparse
+import os
+import queue
+import re
+import shlex
+import shutil
+import signal
 import subprocess
-from multiprocessing import Pool, Process
-#TODO: include core_pinning, multiprocess handling
-#https://github.com/daajoe/reprobench/blob/jkf_wip_pnode/reprobench/core/worker.py
-#TODO: include setting to base_frequency
-import pathlib
-from subprocess import Popen, PIPE
+import sys
+import threading
 import time
-from tqdm import tqdm
-
-num_workers = 1
-#num_workers = int(subprocess.check_output('cat /proc/cpuinfo | grep "physical id" | sort -u | wc -l',shell=True))
-#isunix = (platform == "linux" or platform == "linux2")
-
-startlist = []
-with open('start_list.txt') as fh:
-    for task in fh.readlines():
-        if task == '':
-            continue
-        task=task.split('\n')[0]
-        startlist.append(task)
-
-num_pending=len(startlist)
-#pool = Pool(num_workers)
-#pool_iterator = pool.imap_unordered(self.spawn_worker, jobs_address)
-#for _ in pool_iterator:
-#    progress_bar.update()
-
-
-cwd = str(pathlib.Path.cwd())
-progress_bar = tqdm(desc="Executing runs", total=num_pending)
-
-with open('standalone_stdout.txt','w') as fh_stdout:
-    with open('standalone_stderr.txt', 'w') as fh_stderr:
-        for cmd in startlist:
-            print(f'Executing run "{cmd}"...')
-            p_stats = Popen(cmd, stdout=PIPE, stderr=PIPE, shell=True, close_fds=True, cwd=cwd)
-            output, err = p_stats.communicate()
-            fh_stdout.write('='*20 + cmd + '='*20 + '\n')
-            fh_stderr.write('='*20 + cmd + '='*20 + '\n')
-            fh_stdout.write(str(output.decode('utf8')))
-            fh_stderr.write(str(err.decode('utf8')))
-            fh_stdout.write('='*80 + '\n')
-            fh_stderr.write('='*80 + '\n')
-            progress_bar.update()
-progress_bar.close()
-#pool.close()
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+CPUS_PER_TASK = {{ cpus_per_task }}
+MEM_LINES = {{ mem_lines }}
+INDEX_WIDTH = {{ index_width }}
+
+REGEX_RUNNER = re.compile(r'^\./runner\.sh (\d+)$')
+REGEX_LOG_FOLDER = re.compile(r'^log_folder="\$HOME"/(.*?); input_line=')
+
+stopping = threading.Event()
+running = {}
+running_lock = threading.Lock()
+
+
+SLOTS_SH = r'''
+{% include 'slots.sh.jinja2' %}
+'''
+
+
+def detect_cores():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def detect_slots(max_slots):
+    """
+    Disjoint cpu sets of whole physical cores within one NUMA node, the same placement as in whole_node mode.
+    """
+    try:
+        out = subprocess.run(['bash', '-c', SLOTS_SH + 'build_slots "$1" "$2"', 'slots', str(CPUS_PER_TASK),
+                              str(max_slots)], capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return []
+    return out.split()
+
+
+def log_folder(cmd):
+    """
+    Run folder of a start list entry, i.e. the folder of its start.sh or the log folder of its task table row.
+    """
+    m = REGEX_RUNNER.match(cmd)
+    if m is None:
+        return Path(cmd).parent
+    with open('task_table.idx', 'rb') as fh:
+        fh.seek((int(m.group(1)) - 1) * INDEX_WIDTH)
+        offset = int(fh.read(INDEX_WIDTH))
+    with open('task_table.txt', 'rb') as fh:
+        fh.seek(offset)
+        row = fh.readline().decode()
+    m = REGEX_LOG_FOLDER.match(row)
+    return Path.home() / shlex.split(m.group(1))[0]
+
+
+def finished(cmd):
+    return (log_folder(cmd) / '00_finished.log').exists()
+
+
+def run_task(index, cmd, slots):
+    if stopping.is_set():
+        return 'cancelled'
+    cores = slots.get()
+    try:
+        out = Path('standalone_logs', f'task{index}_stdout.log')
+        err = Path('standalone_logs', f'task{index}_stderr.log')
+        if cores is not None:
+            cmd = f'taskset -c {cores} {cmd}'
+        with open(out, 'w') as fh_stdout, open(err, 'w') as fh_stderr:
+            # a new session keeps Ctrl-C away from the runs, they are stopped by the executor instead
+            p = subprocess.Popen(cmd, stdout=fh_stdout, stderr=fh_stderr, shell=True, close_fds=True,
+                                 start_new_session=True)
+            with running_lock:
+                running[index] = p
+            ret = p.wait()
+            with running_lock:
+                del running[index]
+        return 'ok' if ret == 0 else 'failed'
+    finally:
+        slots.put(cores)
+
+
+def kill_running():
+    with running_lock:
+        for p in running.values():
+            try:
+                os.killpg(p.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def handle_sigint(signum, frame):
+    if not stopping.is_set():
+        print('\nStopping: waiting for running tasks to finish (press Ctrl-C again to kill them)...', flush=True)
+        stopping.set()
+    else:
+        print('\nKilling running tasks...', flush=True)
+        kill_running()
+
+
+def format_eta(seconds):
+    if seconds == float('inf'):
+        return '-'
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{secs:02d}'
+
+
+class Progress:
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.start = time.time()
+        self.last_report = 0
+        self.bar = tqdm(desc="Executing runs", total=total) if tqdm is not None else None
+
+    def update(self):
+        self.done += 1
+        if self.bar is not None:
+            self.bar.update()
+            return
+        now = time.time()
+        if now - self.last_report >= 10 or self.done == self.total:
+            self.last_report = now
+            rate = self.done / max(now - self.start, 1e-9)
+            eta = (self.total - self.done) / rate if rate > 0 else float('inf')
+            print(f'{self.done}/{self.total} runs, {rate * 3600:.1f} runs/h, ETA {format_eta(eta)}', flush=True)
+
+    def close(self):
+        if self.bar is not None:
+            self.bar.close()
+
+
+def main():
+    cores = detect_cores()
+    cpu_slots = detect_slots(max(1, len(cores) // CPUS_PER_TASK))
+    default_workers = max(1, min(len(cpu_slots) or len(cores) // CPUS_PER_TASK, MEM_LINES))
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description='Executes all runs of the start list on the local machine.')
+    parser.add_argument('-j', '--workers', type=int, default=default_workers, help='number of parallel runs')
+    parser.add_argument('--no-pinning', action='store_true', help='do not pin the runs to disjoint cores')
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    os.makedirs('standalone_logs', exist_ok=True)
+
+    startlist = []
+    with open('start_list.txt') as fh:
+        for index, task in enumerate(fh, start=1):
+            task = task.strip()
+            if task == '':
+                continue
+            startlist.append((index, task))
+
+    pending = [(index, cmd) for index, cmd in startlist if not finished(cmd)]
+    print(f'{len(startlist) - len(pending)} of {len(startlist)} runs already finished, '
+          f'executing {len(pending)} runs with {args.workers} workers.')
+
+    slots = queue.Queue()
+    pinning = not args.no_pinning and shutil.which('taskset') is not None
+    if pinning and args.workers > len(cpu_slots):
+        print(f'Only {len(cpu_slots)} disjoint sets of {CPUS_PER_TASK} cpus, the other workers are not pinned.')
+    for k in range(args.workers):
+        slots.put(cpu_slots[k] if pinning and k < len(cpu_slots) else None)
+
+    signal.signal(signal.SIGINT, handle_sigint)
+    results = {'ok': 0, 'failed': 0, 'cancelled': 0}
+    progress = Progress(len(pending))
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(run_task, index, cmd, slots) for index, cmd in pending]
+        for f in as_completed(futures):
+            result = f.result()
+            results[result] += 1
+            if result != 'cancelled':
+                progress.update()
+    progress.close()
+    print(f'{results["ok"]} runs succeeded, {results["failed"]} failed, {results["cancelled"]} were not started.')
+    if results['cancelled'] > 0:
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
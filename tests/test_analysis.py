@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from copperbench.analysis import ranks, score_matrix, summary
+
+TIMEOUT = 10
+
+
+def runs():
+    # a solves i1 twice, fails i2; b solves i1, solves i2 once out of two runs
+    return {
+        'config': ['a', 'a', 'a', 'b', 'b', 'b'],
+        'instance': ['i1', 'i1', 'i2', 'i1', 'i2', 'i2'],
+        'runsolver_cpu_time': [2.0, 4.0, 20.0, 5.0, 6.0, 30.0],
+    }
+
+
+def test_score_matrix_par10():
+    matrix = score_matrix(runs(), TIMEOUT, k=10)
+    assert list(matrix.configs) == ['a', 'b']
+    assert list(matrix.instances) == ['i1', 'i2']
+    np.testing.assert_allclose(matrix.scores, [[3, 100], [5, 53]])
+    np.testing.assert_allclose(matrix.solved, [[1, 0], [1, 0.5]])
+    np.testing.assert_array_equal(matrix.runs, [[2, 1], [1, 2]])
+
+
+def test_ranks_average_ties_and_missing():
+    data = {
+        'config': ['a', 'b', 'c', 'a', 'b'],
+        'instance': ['i1', 'i1', 'i1', 'i2', 'i2'],
+        'runsolver_cpu_time': [1.0, 1.0, 3.0, 5.0, 2.0],
+    }
+    np.testing.assert_allclose(ranks(score_matrix(data, TIMEOUT)), [[1.5, 2], [1.5, 1], [3, np.nan]])
+
+
+def test_summary_k1_counts_solved_instances_not_scores():
+    result = summary(runs(), TIMEOUT, k=1)
+    assert result['a'] == {'runs': 3, 'solved': 2, 'par1': pytest.approx(16 / 3), 'mean_rank': 1.5}
+    assert result['b']['solved'] == 2
+    # with k = 1 the scores of the unsolved runs equal the timeout, only i1 is solved by every run of a config
+    assert result['virtual_best']['solved'] == 1
+    assert result['virtual_best']['par1'] == pytest.approx((3 + 8) / 2)
+    assert result['virtual_worst']['solved'] == 1
+    assert result['virtual_worst']['par1'] == pytest.approx((5 + 10) / 2)
@@ -0,0 +1,22 @@
+from copperbench.bench import BenchConfig, count_tasks, estimate
+
+
+def test_estimate_from_the_lists_only(tmp_path):
+    (tmp_path / 'configs.txt').write_text('./solver --a\n# ./solver --b\n./solver --c\n')
+    (tmp_path / 'small.cnf').write_bytes(b'\0' * 100)
+    (tmp_path / 'large.cnf').write_bytes(b'\0' * 300)
+    (tmp_path / 'instances.txt').write_text('small.cnf\nlarge.cnf\nmissing.cnf\n')
+    bench_config = BenchConfig(name='bench', instances='instances.txt', configs='configs.txt', timeout=100,
+                               request_cpus=1, mem_limit=1000, runs=2, max_parallel_jobs=4)
+
+    est = estimate(bench_config, str(tmp_path))
+    assert est['tasks'] == count_tasks(bench_config, str(tmp_path)) == 2 * 3 * 2
+    # one memory line of 24 cpus / 8 lines, timeout + slurm_time_buffer + runsolver_kill_delay
+    assert est['cpus_per_task'] == 3
+    assert est['slurm_time'] == 115
+    assert est['core_hours'] == 12 * 3 * 115 / 3600
+    assert est['missing_files'] == 1
+    # eight slots per node, each staging the largest instance
+    assert est['shm_peak_per_node'] == 8 * 300
+    assert est['parallel_tasks'] == 4
+    assert est['makespan'] == 3 * 115
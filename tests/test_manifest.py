@@ -0,0 +1,32 @@
+import subprocess
+
+from copperbench.bench import TaskTable, manifest_row
+
+
+def read_row(bench_folder, task_id):
+    # like runner.sh: one seek into the index and one into the table
+    with open(bench_folder / 'task_table.idx', 'rb') as fh:
+        fh.seek((task_id - 1) * TaskTable.INDEX_WIDTH)
+        offset = int(fh.read(TaskTable.INDEX_WIDTH))
+    with open(bench_folder / 'task_table.txt', 'rb') as fh:
+        fh.seek(offset)
+        return fh.readline().decode()
+
+
+def evaluate(row, home):
+    out = subprocess.run(['bash', '-c', row + 'printf "%s\\0" "$log_folder" "$input_line" "$cmd_dir" "$solver_cmd"'],
+                         capture_output=True, text=True, check=True, env={'HOME': str(home)}).stdout
+    return out.split('\0')[:-1]
+
+
+def test_task_table_rows_are_found_through_the_index_in_task_order(tmp_path):
+    table = TaskTable(tmp_path)
+    for i in range(3):
+        table.write(manifest_row(f'bench/config1/instance{i}/run1', f"it's {i}", '~/solvers', [],
+                                 f'./solver --seed {i} "$file"'))
+    table.close(order=[2, 0, 1])
+
+    assert evaluate(read_row(tmp_path, 1), tmp_path) == [
+        f'{tmp_path}/bench/config1/instance2/run1', "it's 2", f'{tmp_path}/solvers', './solver --seed 2 "$file"']
+    assert evaluate(read_row(tmp_path, 2), tmp_path)[0] == f'{tmp_path}/bench/config1/instance0/run1'
+    assert evaluate(read_row(tmp_path, 3), tmp_path)[0] == f'{tmp_path}/bench/config1/instance1/run1'
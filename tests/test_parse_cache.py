@@ -0,0 +1,40 @@
+import re
+
+from copperbench.postprocess import RegexReader, process_bench
+
+parsed = []
+
+
+class CountingReader(RegexReader):
+
+    def __call__(self, log_file):
+        parsed.append(log_file.parent.name)
+        return super().__call__(log_file)
+
+
+def write_run(bench_folder, run, stdout):
+    run_folder = bench_folder / 'config1' / 'instance1' / run
+    run_folder.mkdir(parents=True, exist_ok=True)
+    (run_folder / 'stdout.log').write_text(stdout)
+
+
+def test_cache_reparses_only_changed_runs_and_changed_readers(tmp_path):
+    write_run(tmp_path, 'run1', 'result 1')
+    write_run(tmp_path, 'run2', 'result 2')
+    reader = CountingReader(re.compile(r'result (?P<result>\d+)'))
+
+    first = process_bench(tmp_path, reader, cache=True)
+    assert sorted(parsed) == ['run1', 'run2']
+    parsed.clear()
+    assert process_bench(tmp_path, reader, cache=True) == first
+    assert parsed == []
+
+    write_run(tmp_path, 'run2', 'result 22')
+    assert [r['result'] for r in process_bench(tmp_path, reader, cache=True)] == ['1', '22']
+    assert parsed == ['run2']
+    parsed.clear()
+
+    # a different regex is a different reader
+    other = CountingReader(re.compile(r'result (?P<value>\d+)'))
+    assert [r['value'] for r in process_bench(tmp_path, other, cache=True)] == ['1', '22']
+    assert sorted(parsed) == ['run1', 'run2']
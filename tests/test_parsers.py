@@ -0,0 +1,29 @@
+import re
+
+from copperbench.parsers import TailRegexReader, parse_runsolver, parse_varfile
+
+
+def test_tail_reader_finds_the_last_match_beyond_the_first_tail(tmp_path):
+    log = tmp_path / 'stdout.log'
+    with open(log, 'w') as fh:
+        for cost in range(1000, 0, -1):
+            fh.write(f'o {cost}\n')
+        # the last cost is far before the first tail of 64 bytes, a line cut in the middle must not match
+        fh.write('c searching\n' * 100)
+    reader = TailRegexReader(re.compile(r'^o (?P<cost>\d+)$', re.M), size=64)
+    assert reader(log) == {'cost': '1'}
+    assert TailRegexReader(re.compile(r'^s (?P<status>\w+)$', re.M), size=64)(log) is None
+
+
+def test_runsolver_and_varfile_logs_are_typed(tmp_path):
+    runsolver = tmp_path / 'runsolver.log'
+    runsolver.write_text('Maximum CPU time exceeded: sending SIGTERM then SIGKILL\n'
+                         'Child ended because it received signal 15 (SIGTERM)\n'
+                         'Real time (s): 10.5\nCPU time (s): 10.02\nChild status: 0\n')
+    assert parse_runsolver(runsolver) == {'runsolver_wall_time': 10.5, 'runsolver_cpu_time': 10.02,
+                                          'runsolver_exit_status': 0, 'runsolver_signal': 15,
+                                          'runsolver_limit': 'CPU time'}
+    varfile = tmp_path / 'varfile.log'
+    varfile.write_text('WCTIME=10.5\nTIMEOUT=true\nMEMOUT=false\nMAXVM=1024\n')
+    assert parse_varfile(varfile) == {'varfile_wctime': 10.5, 'varfile_timeout': True, 'varfile_memout': False,
+                                      'varfile_maxvm': 1024}
@@ -0,0 +1,32 @@
+import gzip
+import io
+import tarfile
+
+from copperbench.postprocess import archive_runs
+
+
+def append_run(archive, run, files):
+    # like archive_run in start.sh: every run is appended as a compressed tar stream of its own
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w') as tar:
+        for name, text in files.items():
+            data = text.encode()
+            info = tarfile.TarInfo(f'bench/config1/instance1/{run}/{name}')
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    with open(archive, 'ab') as fh:
+        fh.write(gzip.compress(buffer.getvalue()))
+
+
+def test_archive_runs_reads_every_member_of_a_chunk(tmp_path):
+    archive = tmp_path / 'chunk_0.tar.gz'
+    for i in range(1, 31):
+        append_run(archive, f'run{i}', {'stdout.log': f'result {i}', 'stderr.log': '', 'varfile.log': 'WCTIME=1'})
+
+    runs = []
+    for config, instance, run_folder in archive_runs(archive, ['stdout.log', 'varfile.log']):
+        runs.append((config, instance, run_folder.name, (run_folder / 'stdout.log').read_text()))
+
+    assert len(runs) == 30
+    assert runs[0] == ('config1', 'instance1', 'run1', 'result 1')
+    assert runs[-1] == ('config1', 'instance1', 'run30', 'result 30')
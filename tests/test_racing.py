@@ -0,0 +1,55 @@
+import json
+import math
+
+import pytest
+
+from copperbench.racing import chi2_sf, friedman, race
+
+
+def test_chi2_sf_matches_critical_values():
+    # 95% quantiles of the chi-squared distribution with 1 to 4 degrees of freedom
+    for x, df in [(3.841459, 1), (5.991465, 2), (7.814728, 3), (9.487729, 4)]:
+        assert chi2_sf(x, df) == pytest.approx(0.05, abs=1e-6)
+    assert chi2_sf(0, 3) == 1.0
+
+
+def test_friedman_ranks_ties_by_average():
+    p_value, rank_sums = friedman([[1, 2, 3]] * 10)
+    assert rank_sums == [10, 20, 30]
+    assert p_value == pytest.approx(math.exp(-10))
+    assert friedman([[1, 1, 2]])[1] == [1.5, 1.5, 3]
+
+
+class FakeScheduler:
+    """
+    Finishes the tasks instantly, config1 takes 1s, config2 2s and config3 times out on every instance.
+    """
+
+    def __init__(self, bench_folder, folders):
+        self.bench_folder = bench_folder
+        self.folders = folders
+        self.runs = []
+
+    def run(self, task_ids):
+        for task_id in task_ids:
+            config, instance, run = self.folders[task_id - 1]
+            run_folder = self.bench_folder / config / instance / run
+            run_folder.mkdir(parents=True)
+            cputime = {'config1': 1, 'config2': 2, 'config3': 10}[config]
+            (run_folder / 'varfile.log').write_text(f'CPUTIME={cputime}\nTIMEOUT={str(cputime == 10).lower()}\n')
+            (run_folder / '00_finished.log').touch()
+            self.runs.append(task_id)
+
+
+def test_race_eliminates_configs_worse_than_the_critical_difference(tmp_path):
+    folders = [(f'config{c}', f'instance{i}', 'run1') for c in range(1, 4) for i in range(1, 11)]
+    with open(tmp_path / 'metadata.json', 'w') as fh:
+        fh.write(json.dumps({'timeout': 10, 'configs': {}, 'tasks': [[c, i, 1] for c, i, _ in folders]}))
+    scheduler = FakeScheduler(tmp_path, folders)
+
+    result = race(tmp_path, scheduler, block=5, min_instances=5)
+    # config3 is out after the first block, config2 after the second
+    assert result['alive'] == ['config1']
+    assert result['eliminated']['config3']['instances'] == 5
+    assert result['eliminated']['config2']['instances'] == 10
+    assert result['scheduled_tasks'] == len(scheduler.runs) == 25
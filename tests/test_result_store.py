@@ -0,0 +1,47 @@
+import os
+
+from copperbench.result_store import FileHasher, ResultStore
+
+
+def test_fingerprints_follow_contents_and_limits(tmp_path):
+    solver = tmp_path / 'solver'
+    solver.write_text('v1')
+    instance = tmp_path / 'a.cnf'
+    instance.write_text('p cnf 1 1')
+    shm_files = [(solver, '/dev/shm/x/solver'), (instance, '/dev/shm/x/a.cnf')]
+    cmd = '/dev/shm/x/solver /dev/shm/x/a.cnf'
+    store = ResultStore(tmp_path / 'store', FileHasher(), {'timeout': 10})
+    digest = store.pair_digest(cmd, shm_files)
+
+    # a copy with the same content at another path is the same pair
+    copy = tmp_path / 'b.cnf'
+    copy.write_text('p cnf 1 1')
+    assert store.pair_digest(cmd, [(solver, '/dev/shm/x/solver'), (copy, '/dev/shm/x/a.cnf')]) == digest
+    assert ResultStore(tmp_path / 'store', FileHasher(), {'timeout': 20}).pair_digest(cmd, shm_files) != digest
+    # same size, the mtime differs even on file systems with a coarse timestamp
+    instance.write_text('p cnf 2 1')
+    os.utime(instance, (0, 0))
+    assert store.pair_digest(cmd, shm_files) != digest
+    # the staged solver is hashed through its source
+    instance.write_text('p cnf 1 1')
+    solver.write_text('v2')
+    os.utime(solver, (0, 0))
+    assert store.pair_digest(cmd, shm_files) != digest
+
+    assert store.run_fingerprint(digest, 'solver --seed 1', 1) != store.run_fingerprint(digest, 'solver --seed 2', 1)
+    assert store.run_fingerprint(digest, 'solver', 1) != store.run_fingerprint(digest, 'solver', 2)
+
+
+def test_lookup_only_returns_finished_runs(tmp_path):
+    store = ResultStore(tmp_path / 'store', FileHasher(), {})
+    run_folder = tmp_path / 'bench' / 'config1' / 'instance1' / 'run1'
+    run_folder.mkdir(parents=True)
+    fingerprint = store.run_fingerprint('pair', 'solver', 1)
+    entry = store.path / store.entry(fingerprint)
+    entry.parent.mkdir(parents=True)
+    entry.symlink_to(run_folder)
+
+    assert store.lookup(fingerprint) is None
+    (run_folder / '00_finished.log').touch()
+    assert store.lookup(fingerprint) == os.path.realpath(run_folder)
+    assert store.lookup(store.run_fingerprint('pair', 'solver', 2)) is None
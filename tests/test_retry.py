@@ -0,0 +1,43 @@
+from copperbench.retry import classify_run, slurm_errors
+
+OK_CODES = [0, 10, 20]
+
+
+def write_run(run_folder, finished=True, varfile='WCTIME=1\nTIMEOUT=false\nMEMOUT=false\n',
+              runsolver='Child status: 10\n'):
+    run_folder.mkdir(parents=True)
+    (run_folder / 'node_info.log').write_text('Node: node7\n')
+    if varfile is not None:
+        (run_folder / 'varfile.log').write_text(varfile)
+    if runsolver is not None:
+        (run_folder / 'runsolver.log').write_text(runsolver)
+    if finished:
+        (run_folder / '00_finished.log').touch()
+    return run_folder
+
+
+def test_classify_run(tmp_path):
+    assert classify_run(write_run(tmp_path / 'ok'), OK_CODES) == ('finished', 'node7')
+    assert classify_run(write_run(tmp_path / 'to', varfile='TIMEOUT=true\n'), OK_CODES)[0] == 'timeout'
+    assert classify_run(write_run(tmp_path / 'mo', varfile='MEMOUT=true\n'), OK_CODES)[0] == 'memout'
+    assert classify_run(write_run(tmp_path / 'err', runsolver='Child status: 1\n'), OK_CODES)[0] == 'solver_error'
+    assert classify_run(write_run(tmp_path / 'sig', runsolver='Child ended because it received signal 11\n'),
+                        OK_CODES)[0] == 'solver_error'
+    # runsolver never wrote its logs or the run did not finish
+    assert classify_run(write_run(tmp_path / 'empty', runsolver=''), OK_CODES) == ('infrastructure', 'node7')
+    assert classify_run(write_run(tmp_path / 'lost', finished=False), OK_CODES) == ('infrastructure', 'node7')
+    assert classify_run(tmp_path / 'never', OK_CODES) == ('not_started', None)
+
+
+def test_slurm_errors_map_packed_elements_and_retries_to_tasks(tmp_path):
+    (tmp_path / 'batch_job.slurm').write_text('first=$(( (SLURM_ARRAY_TASK_ID - 1) * 3 + 1 ))\n')
+    logs = tmp_path / 'slurm_logs'
+    logs.mkdir()
+    (logs / 'slurm-100_2_stderr.log').write_text(
+        'slurmstepd: error: *** JOB 100 ON node3 CANCELLED AT 2024-01-01T00:00:00 DUE TO NODE FAILURE ***\n')
+    (logs / 'slurm-100_3_stderr.log').write_text('')
+    (logs / 'slurm-retry1-200_2_stderr.log').write_text('No space left on device\n')
+
+    errors = slurm_errors(tmp_path, [[1, 9]])
+    assert errors == {4: ('node failure', 'node3'), 5: ('node failure', 'node3'), 6: ('node failure', 'node3'),
+                      9: ('no space left on device', None)}
@@ -0,0 +1,41 @@
+import os
+import types
+
+import jinja2
+import numpy as np
+
+import copperbench
+from copperbench.series import RunSeries, on_grid, read_series, summarize
+
+
+def load_sampler():
+    # the sampler as written to a benchmark folder
+    loader = jinja2.FileSystemLoader(searchpath=f'{os.path.dirname(copperbench.__file__)}/templates/')
+    source = jinja2.Environment(loader=loader).get_template('sampler.py').render(sample_interval=0.1,
+                                                                                  sample_events=[])
+    module = types.ModuleType('sampler')
+    exec(compile(source, 'sampler.py', 'exec'), module.__dict__)
+    return module
+
+
+def test_series_written_by_the_sampler_round_trip(tmp_path):
+    sampler = load_sampler()
+    writer = sampler.SeriesWriter(tmp_path / 'resources.bin', ['time', 'rss', 'cpu'])
+    for t, rss, cpu in [(0.0, 100, 0.0), (1.0, 300, 1.0), (2.0, 200, 0.5)]:
+        writer.write(t, rss, cpu)
+    writer.close()
+    # a row cut off by a killed run is ignored
+    with open(tmp_path / 'resources.bin', 'ab') as fh:
+        fh.write(b'\0' * 5)
+
+    data = read_series(tmp_path / 'resources.bin')
+    assert data.dtype.names == ('time', 'rss', 'cpu')
+    assert data['rss'].tolist() == [100, 300, 200]
+
+    runs = [RunSeries('config1', 'instance1', 'run1', tmp_path / 'resources.bin')]
+    grid = on_grid(runs, 'rss', np.array([-1.0, 0.5, 1.0, 5.0]))
+    np.testing.assert_array_equal(grid, [[np.nan, 100, 300, 200]])
+    result = summarize(runs)
+    assert result['peak_rss'][0] == 300
+    assert result['mean_cpu'][0] == 0.5
+    assert result['samples'][0] == 3
@@ -0,0 +1,33 @@
+import time
+
+from copperbench.status import StatusJournal
+
+
+def write_journal(bench_folder, name, records):
+    folder = bench_folder / 'status'
+    folder.mkdir(exist_ok=True)
+    with open(folder / name, 'a') as fh:
+        fh.writelines(f'{stamp} {record}\n' for stamp, record in records)
+
+
+def test_runs_without_end_record_are_lost(tmp_path):
+    now = int(time.time())
+    write_journal(tmp_path, '100_node1.log', [(now - 50, 'start c/i/run1'), (now - 40, 'end c/i/run1 ok 0'),
+                                             (now - 30, 'start c/i/run2')])
+    write_journal(tmp_path, '200_node2.log', [(now - 500, 'start c/i/run3'), (now - 20, 'start c/i/run4')])
+    journal = StatusJournal(tmp_path, [0, 10, 20])
+    journal.update()
+
+    # run3 is older than the slurm time of a run
+    report = journal.report(4, 100)
+    assert (report['finished'], report['running'], report['lost']) == (1, 2, 1)
+    # array job 100 left the queue
+    assert sorted(journal.lost(100, {'200'})) == ['c/i/run2', 'c/i/run3']
+    report = journal.report(4, 1000, {'100', '200'})
+    assert (report['running'], report['lost']) == (3, 0)
+
+    # a late end record of a lost run still counts
+    write_journal(tmp_path, '200_node2.log', [(now, 'end c/i/run3 timeout 0')])
+    journal.update()
+    report = journal.report(4, 100)
+    assert (report['finished'], report['timeout'], report['running'], report['lost']) == (2, 1, 2, 0)